@@ -0,0 +1,150 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+Tick throughput benchmark.
+Times Game.update or STS2Environment.step for every combination of team size, rules preset,
+agents or NPCs and history recording on or off, and reports ticks per second, per tick
+latency percentiles and peak traced memory as JSON, e.g.
+
+    python -m sts2.bench --ticks 2000 --teams 1 3 11 --output bench.json
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from sts2.environment import STS2Environment, get_game
+from sts2.game import rules
+from sts2.game.game_state import Action
+from sts2.game.simulation import HistoryPolicy
+
+RULE_PRESETS = {
+    'PACMAN': rules.PACMAN_GAME_RULES,
+    'SIMPLE': rules.SIMPLE_GAME_RULES,
+    'STANDARD': rules.STANDARD_GAME_RULES,
+    'PREDICTABLE_INTERCEPTION': rules.PREDICTABLE_INTERCEPTION_GAME_RULES,
+}
+TARGETS = ['game', 'env']  # what a tick is: Game.update or STS2Environment.step
+TEAM_SIZES = [1, 3, 6, 11]
+PERCENTILES = [50, 90, 99]
+TIMEOUT_TICKS = 1e10  # no case should reach GAME_OVER
+
+
+def make_ticker(target, team_size, preset, agents, history, seed):
+    """ A function running one tick of a freshly built game of the given case. """
+    num_agents = team_size if agents else 0
+    policy = HistoryPolicy() if history else HistoryPolicy(HistoryPolicy.OFF)
+    game_rules = RULE_PRESETS[preset]
+    if target == 'game':
+        game = get_game(team_size, team_size, num_agents, num_agents, TIMEOUT_TICKS,
+                        history_policy=policy, seed=seed, rules=game_rules)
+        # array actions stay in effect until replaced, so the agents act on every tick
+        adapter = game.client_adapter
+        num_agents = len(adapter.GetAgentSlots())
+        adapter.receive_action_arrays(np.full(num_agents, Action.ACTION_LIST.index(Action.NONE)),
+                                      np.tile([0.5, 1.0], (num_agents, 1)))
+        return lambda: game.update(record_game_state=history)
+
+    env = STS2Environment(num_home_players=team_size, num_away_players=team_size,
+                          num_home_agents=num_agents, num_away_agents=num_agents,
+                          timeout_ticks=TIMEOUT_TICKS, history_policy=policy, rules=game_rules)
+    env.seed(seed)
+    env.reset()
+    # the agents skate in a fixed direction, that exercises the action path without a policy
+    action = {player.name: {'action': 'NONE', 'input': [0.5, 1.0]} for player in
+              env.game.client_adapter.GetAgents()}
+    return lambda: env.step(action)
+
+
+def run_case(target, team_size, preset, agents, history, ticks=1000, warmup=50, seed=0,
+             memory_ticks=100):
+    tick = make_ticker(target, team_size, preset, agents, history, seed)
+    for _ in range(warmup):
+        tick()
+    latencies = np.zeros(ticks, dtype=np.int64)
+    start = time.perf_counter_ns()
+    for i in range(ticks):
+        t = time.perf_counter_ns()
+        tick()
+        latencies[i] = time.perf_counter_ns() - t
+    total = time.perf_counter_ns() - start
+
+    # tracing slows every allocation down, so memory is measured in a separate run
+    tracemalloc.start()
+    tick = make_ticker(target, team_size, preset, agents, history, seed)
+    for _ in range(memory_ticks):
+        tick()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'target': target, 'team_size': team_size, 'rules': preset, 'agents': agents,
+        'history': history, 'ticks': ticks,
+        'ticks_per_sec': ticks / (total * 1e-9),
+        'latency_us': dict({'p%d' % p: float(v) * 1e-3 for p, v in
+                            zip(PERCENTILES, np.percentile(latencies, PERCENTILES))},
+                           mean=float(latencies.mean()) * 1e-3,
+                           max=float(latencies.max()) * 1e-3),
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def run_suite(targets=TARGETS, team_sizes=TEAM_SIZES, presets=tuple(RULE_PRESETS),
+              agents=(False, True), history=(False, True), ticks=1000, warmup=50, seed=0,
+              memory_ticks=100, verbose=False):
+    results = []
+    for case in itertools.product(targets, team_sizes, presets, agents, history):
+        result = run_case(*case, ticks=ticks, warmup=warmup, seed=seed,
+                          memory_ticks=memory_ticks)
+        if verbose:
+            print('%-4s %2dv%-2d %-24s agents=%-5s history=%-5s %9.0f ticks/s  p99 %8.1fus' % (
+                result['target'], case[1], case[1], case[2], case[3], case[4],
+                result['ticks_per_sec'], result['latency_us']['p99']), file=sys.stderr)
+        results.append(result)
+    return {
+        'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sts2.bench', description=__doc__.strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=TARGETS)
+    parser.add_argument('--teams', nargs='+', type=int, default=TEAM_SIZES,
+                        help='players per team')
+    parser.add_argument('--rules', nargs='+', choices=list(RULE_PRESETS),
+                        default=list(RULE_PRESETS))
+    parser.add_argument('--agents', nargs='+', choices=['npc', 'agent'],
+                        default=['npc', 'agent'], help='NPC teams or teams of agents')
+    parser.add_argument('--history', nargs='+', choices=['off', 'on'], default=['off', 'on'])
+    parser.add_argument('--ticks', type=int, default=1000, help='timed ticks per case')
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--memory-ticks', type=int, default=100,
+                        help='ticks of the separate run that measures memory')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to write, stdout by default')
+    parser.add_argument('--quiet', action='store_true', help='no progress on stderr')
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.targets, args.teams, args.rules,
+                       [agents == 'agent' for agents in args.agents],
+                       [history == 'on' for history in args.history], args.ticks, args.warmup,
+                       args.seed, args.memory_ticks, verbose=not args.quiet)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,12 @@
 
 import numpy as np
 
+from sts2.game.game_state import Action, GameStateLayout
+
 
 def format_state(game):
     # Fields supported by the game directly
-    state = {field: game.state.series[field] for field in game.state.series.index}
+    state = game.state.GetSnapshot()
 
     # Additional custom fields:
     state['tick'] = game.tick
@@ -19,30 +21,188 @@ def format_state(game):
         state['prefixes'][player.name] = game.state.GetPlayerFieldPrefix(player)
 
     # Scoring probabilities for all the players, computed by the game.
-    state['score_prob'] = {}
-    for player in game.players:
-        prob = game.PlayerShot(player, True, 0)
-        state['score_prob'][player.name] = prob
+    probs = game.EvaluateShots(game.players)
+    state['score_prob'] = {player.name: float(prob) for player, prob in zip(game.players, probs)}
 
     return state
 
 
 class ClientAdapter(object):
+    # what send_state returns
+    OBSERVATION_DICT = 'dict'  # format_state output
+    OBSERVATION_VECTOR = 'vector'  # float32 copy of the state vector, see GetMetadata
+    OBSERVATION_MATRIX = 'matrix'  # float32 (agents, features), one egocentric row per agent
+    OBSERVATION_MODES = [OBSERVATION_DICT, OBSERVATION_VECTOR, OBSERVATION_MATRIX]
+
     def __init__(self, game):
         self.game = game
 
         self.action = None
         self.state = None
 
+        self.observation_mode = self.OBSERVATION_DICT
+        self.observation = None
+        self.gather_index = None
+        self.gather_mask = None
+        self.gather_buffer = None
+        self.metadata = None
+
+        # array actions, see receive_action_arrays
+        self.array_actions = False
+        self.agent_slots = None
+        self.action_indices = None
+        self.action_inputs = None
+
+    def Fork(self, game):
+        """ Adapter of a forked game, the agents keep acting on the last received actions. """
+        adapter = type(self)(game)
+        adapter.action = self.action
+        if self.array_actions:
+            adapter.receive_action_arrays(self.action_indices, self.action_inputs)
+        return adapter
+
+    def GetAgents(self):
+        return [player for player in self.game.players if player.IsAgent()]
+
+    def GetAgentSlots(self):
+        """ Agent player -> row of the action arrays, in game.players order. """
+        if self.agent_slots is None:
+            agents = self.GetAgents()
+            self.agent_slots = {player: i for i, player in enumerate(agents)}
+            self.action_indices = np.zeros(len(agents), dtype=int)
+            self.action_inputs = np.zeros((len(agents), 2))
+        return self.agent_slots
+
+    def SetObservationMode(self, mode):
+        """
+        Selects what send_state returns. The numeric modes write into a buffer allocated here
+        and return that same array every step, copy it to keep it.
+        """
+        assert (mode in self.OBSERVATION_MODES)
+        self.observation_mode = mode
+        self.metadata = None
+        layout = self.game.state.layout
+        if mode == self.OBSERVATION_VECTOR:
+            self.observation = np.zeros(layout.num_slots, dtype=np.float32)
+        elif mode == self.OBSERVATION_MATRIX:
+            self.gather_index, padding, self.matrix_columns, self.matrix_players = \
+                self.BuildGatherIndex()
+            self.gather_mask = ~padding
+            self.gather_buffer = np.zeros(self.gather_index.shape)
+            self.observation = np.zeros(self.gather_index.shape, dtype=np.float32)
+
+    def BuildGatherIndex(self):
+        # each agent row holds the fields that are not per player, then the agent's own player
+        # block, its teammates' blocks and the opponents' blocks in team order. Both teams get
+        # the slots of the larger one so the columns mean the same for every agent, the blocks
+        # of missing players are zeros.
+        game = self.game
+        layout = game.state.layout
+        player_end = layout.PlayerBaseSlot(layout.num_players)
+        shared = [slot for slot in range(layout.num_slots) if
+                  not layout.player_base_slot <= slot < player_end]
+        team_size = max(len(team) for team in game.team_players)
+        block = range(layout.PLAYER_STRIDE)
+
+        rows = []
+        padding = []
+        players = []
+        for agent in self.GetAgents():
+            teammates = [p for p in game.team_players[agent.team_side] if p is not agent]
+            opponents = game.team_players[1 - agent.team_side]
+            order = [agent] + teammates + [None] * (team_size - 1 - len(teammates)) + \
+                    opponents + [None] * (team_size - len(opponents))
+            row = list(shared)
+            row_padding = [False] * len(shared)
+            for player in order:
+                if player is None:
+                    row.extend(0 for _ in block)
+                else:
+                    base = layout.PlayerBaseSlot(game.registry.GetGlobalIndex(player))
+                    row.extend(base + offset for offset in block)
+                row_padding.extend(player is None for _ in block)
+            rows.append(row)
+            padding.append(row_padding)
+            players.append(['' if player is None else player.name for player in order])
+
+        columns = [layout.slot_names[slot] for slot in shared]
+        prefixes = ['self'] + ['teammate%d' % i for i in range(team_size - 1)] + [
+            'opponent%d' % i for i in range(team_size)]
+        for prefix in prefixes:
+            columns.extend(prefix + field for field in layout.PLAYER_BLOCK)
+        shape = (len(rows), len(columns))
+        return (np.array(rows, dtype=int).reshape(shape),
+                np.array(padding, dtype=bool).reshape(shape), columns, players)
+
+    def GetMetadata(self):
+        """
+        Everything about the observation that stays fixed for a game, built once: the names of
+        the vector fields or matrix columns, teams, player prefixes and the agents.
+        """
+        if self.metadata is None:
+            game = self.game
+            layout = game.state.layout
+            self.metadata = {
+                'observation_mode': self.observation_mode,
+                'fields': list(layout.slot_names),
+                'enums': {layout.slot_names[slot]: enum for slot, enum in
+                          enumerate(layout.slot_enums) if enum is not None},
+                'teams': [[player.name for player in team] for team in game.team_players],
+                'prefixes': {player.name: game.state.GetPlayerFieldPrefix(player) for player in
+                             game.players},
+                'agents': [player.name for player in self.GetAgents()],
+            }
+            if self.observation_mode == self.OBSERVATION_MATRIX:
+                self.metadata['columns'] = self.matrix_columns
+                self.metadata['players'] = self.matrix_players
+        return self.metadata
+
     def receive_action(self, action):
         """ Custom handling. """
+        self.array_actions = False
         self.action = action if action else {}
 
         # Check if the external app wants the game to load a specific state
         load_state = self.action.get("load_state")
         if load_state is not None:
-            for key in self.game.state.series.index:
-                self.game.state.SetField(key, load_state[key])
+            self.game.state.SetFromSnapshot(load_state)
+
+    def receive_action_arrays(self, actions, inputs):
+        """
+        Fast path of receive_action. actions holds an integer index into Action.ACTION_LIST, a
+        float array of whole numbers is accepted too, and inputs an (x, z) input per agent, rows
+        in GetAgents order. Both are checked as a whole and copied
+        into preallocated arrays the agents write into the game state when they think.
+        """
+        num_agents = len(self.GetAgentSlots())
+        actions = np.asarray(actions)
+        inputs = np.asarray(inputs)
+        if actions.shape != (num_agents,) or inputs.shape != (num_agents, 2):
+            raise ValueError('expected %d agent actions and inputs' % num_agents, actions.shape,
+                             inputs.shape)
+        # float arrays, e.g. from a policy, have to hold whole numbers
+        if not np.issubdtype(actions.dtype, np.integer) and not (
+                np.issubdtype(actions.dtype, np.floating) and np.array_equal(actions,
+                                                                             np.trunc(actions))):
+            raise ValueError('action indices must be integers', actions)
+        if num_agents:
+            if actions.min() < 0 or actions.max() >= Action.NUM:
+                raise ValueError('action index out of range', actions)
+            if not np.isfinite(inputs).all():
+                raise ValueError('inputs must be finite', inputs)
+        np.copyto(self.action_indices, actions.astype(self.action_indices.dtype, copy=False))
+        np.copyto(self.action_inputs, inputs)
+        self.array_actions = True
+        self.action = {}
+
+    def apply_agent_action(self, player):
+        """ Writes the array action of an agent straight into its state fields. """
+        state = self.game.state
+        i = self.agent_slots[player]
+        slot = state.player_slots[player]
+        state.values[slot + GameStateLayout.ACTION_OFFSET] = self.action_indices[i]
+        state.values[slot + GameStateLayout.INPUT_OFFSET:
+                     slot + GameStateLayout.INPUT_OFFSET + 2] = self.action_inputs[i]
 
     def unpack_action(self, player):
         player_dct = self.action.get(player.name, {})
@@ -52,5 +212,16 @@ class ClientAdapter(object):
         return discrete_action, continuous_input
 
     def send_state(self):
-        self.state = format_state(self.game)
+        if self.observation_mode == self.OBSERVATION_VECTOR:
+            np.copyto(self.observation, self.game.state.values)
+            return self.observation
+        if self.observation_mode == self.OBSERVATION_MATRIX:
+            np.take(self.game.state.values, self.gather_index, out=self.gather_buffer)
+            # the padding stays zero
+            np.copyto(self.observation, self.gather_buffer, where=self.gather_mask)
+            return self.observation
+        if self.game.profiler is not None:
+            self.state = self.game.profiler.Call('format_state', format_state, self.game)
+        else:
+            self.state = format_state(self.game)
         return self.state
@@ -1,22 +1,28 @@
 # Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
 
-import random
+import copy
+
 import numpy as np
 
 from sts2.client_adapter import ClientAdapter
 from sts2.game.game import Game
 from sts2.game.game_state import Action
 from sts2.game.player import SimplePlayer
-from sts2.game.pygame_interface import PygameInterface, INTERFACE_SETTINGS
 from sts2.game.rules import STANDARD_GAME_RULES
-from sts2.game.settings import TeamSide
+from sts2.game.settings import GamePhase, TeamSide
 
 
 class AgentPlayer(SimplePlayer):
     def __init__(self, name, team_side):
         super().__init__(name, team_side)
 
+    def IsAgent(self):
+        return True
+
     def custom_think(self, game, verbosity):
+        if game.client_adapter.array_actions:
+            game.client_adapter.apply_agent_action(self)
+            return
         discrete_action, continuous_input = game.client_adapter.unpack_action(self)
         if discrete_action is None:
             discrete_action = Action.NONE
@@ -27,7 +33,7 @@ class AgentPlayer(SimplePlayer):
 
 
 def get_game(num_home_players, num_away_players, num_home_agents, num_away_agents,
-             timeout_ticks, verbosity=0):
+             timeout_ticks, verbosity=0, history_policy=None, seed=None, rules=None):
     # Prepare players
     home_players = []
     for i in range(1, num_home_agents + 1):
@@ -41,15 +47,21 @@ def get_game(num_home_players, num_away_players, num_home_agents, num_away_agent
     for i in range(num_away_agents + 1, num_away_players + 1):
         away_players.append(SimplePlayer('a_npc_' + str(i), TeamSide.AWAY))
 
-    # Rules
-    rules = STANDARD_GAME_RULES
+    # Rules, a copy with max_tick set to timeout_ticks, the given ones may be shared
+    rules = copy.copy(rules if rules is not None else STANDARD_GAME_RULES)
     rules.max_tick = int(timeout_ticks)
 
     return Game(home_players + away_players, rules, verbosity=verbosity,
-                client_adapter_cls=ClientAdapter)
+                client_adapter_cls=ClientAdapter, history_policy=history_policy, seed=seed)
+
+
+def seed_game(game, seed):
+    game.Seed(seed)
 
 
 def get_pygame(game):
+    # imported here so headless games never load pygame
+    from sts2.game.pygame_interface import PygameInterface, INTERFACE_SETTINGS
     return PygameInterface(game, INTERFACE_SETTINGS)
 
 
@@ -63,19 +75,52 @@ class STS2Environment(object):
             num_home_agents=0,
             num_away_agents=0,
             with_pygame=False,
-            timeout_ticks=1e10):
-        self.game = get_game(num_home_players, num_away_players, num_home_agents, num_away_agents,
-                             timeout_ticks)
-
-        self.pygame = get_pygame(self.game) if with_pygame else None
+            timeout_ticks=1e10,
+            history_policy=None,
+            observation_mode=ClientAdapter.OBSERVATION_DICT,
+            rules=None):
+        self.game_args = (num_home_players, num_away_players, num_home_agents, num_away_agents,
+                          timeout_ticks, 0, history_policy)
+        self.rules = rules
+        self.with_pygame = with_pygame
+        self.observation_mode = observation_mode
+        self.seed_sequence = None
+        self.profiler = None
+        self.restart()
+
+    def restart(self):
+        """ Starts a new game with the same settings. """
+        self.game = get_game(*self.game_args, rules=self.rules)
+        if self.seed_sequence is not None:
+            seed_game(self.game, self.seed_sequence.spawn(1)[0])
+        self.game.client_adapter.SetObservationMode(self.observation_mode)
+        self.game.SetProfiler(self.profiler)
+        self.pygame = get_pygame(self.game) if self.with_pygame else None
+
+    def SetProfiler(self, profiler):
+        """
+        Profiles the game and every game started later with a profiler.TickProfiler, e.g. a
+        tracer.ChromeTracer, and times the steps too. None turns it off.
+        """
+        self.profiler = profiler
+        self.game.SetProfiler(profiler)
+        self.__dict__.pop('step', None)
+        if profiler is not None:
+            profiler.Wrap(self, 'STS2Environment.step', 'step')
 
     def seed(self, seed):
-        random.seed(seed)
-        np.random.seed(seed)
+        # the current game draws from seed, every restarted game from a stream spawned from it
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        seed_game(self.game, seed)
 
     def reset(self):
         observation = self.game.client_adapter.send_state()
-        return observation, ''
+        if self.observation_mode == ClientAdapter.OBSERVATION_DICT:
+            return observation, ''
+        # the numeric observations come without names, they are described once here
+        return observation, self.game.client_adapter.GetMetadata()
 
     def render(self):
         if self.pygame:
@@ -96,5 +141,5 @@ class STS2Environment(object):
         self.update()
 
         observation = self.game.client_adapter.send_state()
-        done = observation.get('current_phase') == "GAME_OVER"
+        done = self.game.GetGamePhase() == GamePhase.GAME_OVER
         return observation, reward, done, info
@@ -0,0 +1,495 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+Runs many independent games in lockstep with the player state of all games held in
+(games, players, ...) arrays, so one tick of every game costs a fixed number of NumPy calls.
+The game logic mirrors Game and SimplePlayer; the per-player loops of the scalar game are
+replaced by the kernels in sts2.game.kernels. From the same state a tick gives the same result
+as Game.update, except that random numbers are drawn in a different order, so shot and pass
+outcomes and restart positions only agree in distribution. Games that reach GAME_OVER reset
+automatically.
+"""
+
+import numpy
+
+from sts2.game import kernels, npc_brain
+from sts2.game.arena import Arena
+from sts2.game.game_state import Action, GameState, GameStateFrame, GameStateLayout
+from sts2.game.player import Player, SimplePlayer
+from sts2.game.player_registry import PlayerRegistry
+from sts2.game.rules import Rules, STANDARD_GAME_RULES
+from sts2.game.settings import GamePhase, TeamSide
+
+ACTION_CODES = {action: i for i, action in enumerate(Action.ACTION_LIST)}
+PHASE_CODES = {phase: i for i, phase in enumerate(GamePhase.PHASE_LIST)}
+
+
+class BatchGame:
+    GOAL_REWARD = 1.0
+
+    NONE = ACTION_CODES[Action.NONE]
+    SHOOT = ACTION_CODES[Action.SHOOT]
+    STUNNED = ACTION_CODES[Action.STUNNED]
+    PASS_1 = ACTION_CODES[Action.PASS_1]
+
+    PRE_GAME = PHASE_CODES[GamePhase.PRE_GAME]
+    GAME_ON = PHASE_CODES[GamePhase.GAME_ON]
+    STOPPAGE_GOAL = PHASE_CODES[GamePhase.STOPPAGE_GOAL]
+    STOPPAGE_TIMEUP = PHASE_CODES[GamePhase.STOPPAGE_TIMEUP]
+    GAME_OVER = PHASE_CODES[GamePhase.GAME_OVER]
+
+    def __init__(self, num_games, num_home_players, num_away_players, num_home_agents=0,
+                 num_away_agents=0, rules=None, seed=None):
+        if rules is None:
+            rules = STANDARD_GAME_RULES
+        self.rules = rules
+        self.arena = Arena(rules.arena_size)
+        self.num_games = num_games
+        self.rng = numpy.random.default_rng(seed)
+        self.init_exp = 1.0
+
+        # player definitions, named and ordered like environment.get_game
+        home_players = [Player('h_ai_' + str(i), TeamSide.HOME) for i in
+                        range(1, num_home_agents + 1)]
+        home_players += [Player('h_npc_' + str(i), TeamSide.HOME) for i in
+                         range(num_home_agents + 1, num_home_players + 1)]
+        away_players = [Player('a_ai_' + str(i), TeamSide.AWAY) for i in
+                        range(1, num_away_agents + 1)]
+        away_players += [Player('a_npc_' + str(i), TeamSide.AWAY) for i in
+                         range(num_away_agents + 1, num_away_players + 1)]
+        self.players = home_players + away_players
+        self.team_players = [home_players, away_players]
+        self.registry = PlayerRegistry(self.players, self.team_players)
+        self.layout = GameStateLayout(self.registry)
+        self.num_players = len(self.players)
+
+        self.team_side = numpy.array([player.team_side for player in self.players])
+        self.team_index = numpy.array([self.registry.GetTeamIndex(p) for p in self.players])
+        self.is_agent = numpy.array(
+            [self.registry.GetTeamIndex(player) < (num_home_agents, num_away_agents)[
+                player.team_side] for player in self.players], dtype=bool)
+        self.agent_indices = numpy.flatnonzero(self.is_agent)
+        # rank of every player's name within its team, ties in distance go to the lower name
+        self.name_rank = numpy.zeros(self.num_players, dtype=int)
+        for members in self.team_players:
+            for rank, player in enumerate(sorted(members, key=lambda p: p.name)):
+                self.name_rank[self.registry.GetGlobalIndex(player)] = rank
+        self.attacking_net_position = numpy.array(
+            [self.arena.net_position[TeamSide.Opposite(side)] for side in self.team_side],
+            dtype=float).reshape(self.num_players, 2)
+
+        # global player index per (team, team index), -1 where the team has fewer players
+        max_team_size = max(1, num_home_players, num_away_players)
+        self.team_table = numpy.full((TeamSide.NUM_TEAMSIDES, max_team_size), -1)
+        for player in self.players:
+            self.team_table[player.team_side, self.registry.GetTeamIndex(player)] = \
+                self.registry.GetGlobalIndex(player)
+        self.team_sizes = numpy.array([num_home_players, num_away_players])
+        self.pass_targets = self.team_table[:, :len(Action.PASSES)]
+        if self.pass_targets.shape[1] < len(Action.PASSES):
+            self.pass_targets = numpy.pad(
+                self.pass_targets, ((0, 0), (0, len(Action.PASSES) - self.pass_targets.shape[1])),
+                constant_values=-1)
+
+        # working arrays, written into the state vectors at the end of every tick
+        shape = (num_games, self.num_players)
+        self.position = numpy.zeros(shape + (2,))
+        self.velocity = numpy.zeros(shape + (2,))
+        self.input = numpy.zeros(shape + (2,))
+        self.action = numpy.full(shape, self.NONE)
+        self.action_time = numpy.zeros(shape, dtype=int)
+        self.control = numpy.zeros(num_games, dtype=int)
+        self.score = numpy.zeros((num_games, TeamSide.NUM_TEAMSIDES), dtype=int)
+        self.phase = numpy.full(num_games, self.PRE_GAME)
+        self.previous_phase = numpy.full(num_games, self.PRE_GAME)
+        self.tick = numpy.zeros(num_games, dtype=int)
+        self.reward = numpy.zeros(shape)
+
+        # state vectors in the GameState layout, one row per game
+        self.text = {self.registry.GetFieldName(player, GameState.PLAYER_NAME): player.name for
+                     player in self.players}
+        self.initial_values = self.MakeInitialValues()
+        self.values = numpy.tile(self.initial_values, (num_games, 1))
+        self.terminal_values = self.values.copy()
+        self.player_block = self.layout.PlayerBlock(self.values)
+        self.reset()
+
+    def MakeInitialValues(self):
+        values = numpy.zeros(self.layout.num_slots)
+        slots = self.layout.slots
+        values[slots[GameState.ARENA_MIN_X]] = self.arena.min_x
+        values[slots[GameState.ARENA_MAX_X]] = self.arena.max_x
+        values[slots[GameState.ARENA_MIN_Z]] = self.arena.min_z
+        values[slots[GameState.ARENA_MAX_Z]] = self.arena.max_z
+        for side, prefix in zip(TeamSide.TEAMSIDES, GameState.TEAMSIDE_PREFIXES):
+            values[slots[prefix + GameState.TEAM_NET_X]] = self.arena.net_position[side][0]
+            values[slots[prefix + GameState.TEAM_NET_Z]] = self.arena.net_position[side][1]
+            values[slots[prefix + GameState.TEAM_ATTACK_Z]] = numpy.sign(
+                self.arena.net_position[side][1])
+            values[slots[prefix + GameState.TEAM_PLAYERS]] = self.team_sizes[side]
+        for player in self.players:
+            values[self.layout.PlayerSlot(self.registry.GetGlobalIndex(player),
+                                          GameState.PLAYER_ACTION)] = self.NONE
+        return values
+
+    def reset(self):
+        self.ResetGames(numpy.ones(self.num_games, dtype=bool))
+        return self.values
+
+    def ResetGames(self, games):
+        self.position[games] = 0.0
+        self.velocity[games] = 0.0
+        self.input[games] = 0.0
+        self.action[games] = self.NONE
+        self.action_time[games] = 0
+        self.control[games] = max(0, self.team_table[TeamSide.HOME, 0])
+        self.score[games] = 0
+        self.phase[games] = self.PRE_GAME
+        self.previous_phase[games] = self.PRE_GAME
+        self.tick[games] = 0
+        self.WriteValues()
+
+    def step(self, actions=None, inputs=None):
+        """
+        Advances every game one tick.
+        actions is an optional (games, agents) array of indices into Action.ACTION_LIST and inputs
+        an optional (games, agents, 2) array of continuous inputs, agents in self.agent_indices
+        order. Returns the (games, players) rewards and a (games,) done mask; games that are done
+        have already been reset, their final state is kept in self.terminal_values.
+        """
+        self.reward[:] = 0.0
+
+        self.PhaseUpdate()
+        self.AIUpdate(actions, inputs)
+        self.LocomotionUpdate()
+        self.PhysicsUpdate()
+        self.ActionUpdate()
+
+        self.tick += 1
+        self.WriteValues()
+
+        done = self.phase == self.GAME_OVER
+        if done.any():
+            self.terminal_values[done] = self.values[done]
+            self.ResetGames(done)
+        return self.reward.copy(), done
+
+    def WriteValues(self):
+        slots = self.layout.slots
+        block = self.player_block
+        block[..., GameStateLayout.POS_OFFSET:GameStateLayout.POS_OFFSET + 2] = self.position
+        block[..., GameStateLayout.VEL_OFFSET:GameStateLayout.VEL_OFFSET + 2] = self.velocity
+        block[..., GameStateLayout.INPUT_OFFSET:GameStateLayout.INPUT_OFFSET + 2] = self.input
+        block[..., GameStateLayout.ACTION_OFFSET] = self.action
+        block[..., GameStateLayout.ACTION_TIME_OFFSET] = self.action_time
+        self.values[:, slots[GameState.CONTROL_TEAM]] = self.team_side[self.control]
+        self.values[:, slots[GameState.CONTROL_INDEX]] = self.team_index[self.control]
+        for side, prefix in zip(TeamSide.TEAMSIDES, GameState.TEAMSIDE_PREFIXES):
+            self.values[:, slots[prefix + GameState.TEAM_SCORE]] = self.score[:, side]
+        self.values[:, slots[GameState.PREVIOUS_PHASE]] = self.previous_phase
+        self.values[:, slots[GameState.CURRENT_PHASE]] = self.phase
+
+    def LoadValues(self, values, tick):
+        """
+        Inverse of WriteValues, sets every game from (games, slots) state vectors, e.g. the
+        state of scalar Games, and the tick they are at.
+        """
+        slots = self.layout.slots
+        self.values[:] = values
+        block = self.player_block
+        pos, vel, input = (GameStateLayout.POS_OFFSET, GameStateLayout.VEL_OFFSET,
+                           GameStateLayout.INPUT_OFFSET)
+        self.position = block[..., pos:pos + 2].copy()
+        self.velocity = block[..., vel:vel + 2].copy()
+        self.input = block[..., input:input + 2].copy()
+        self.action = block[..., GameStateLayout.ACTION_OFFSET].astype(int)
+        self.action_time = block[..., GameStateLayout.ACTION_TIME_OFFSET].astype(int)
+        self.control = self.team_table[self.values[:, slots[GameState.CONTROL_TEAM]].astype(int),
+                                       self.values[:, slots[GameState.CONTROL_INDEX]].astype(int)]
+        for side, prefix in zip(TeamSide.TEAMSIDES, GameState.TEAMSIDE_PREFIXES):
+            self.score[:, side] = self.values[:, slots[prefix + GameState.TEAM_SCORE]]
+        self.previous_phase = self.values[:, slots[GameState.PREVIOUS_PHASE]].astype(int)
+        self.phase = self.values[:, slots[GameState.CURRENT_PHASE]].astype(int)
+        self.tick[:] = tick
+
+    def GetFrame(self, game_index):
+        """ Copy of one game's state, readable like a scalar Game's history frames. """
+        return GameStateFrame(self.layout, self.values[game_index].copy(), self.text)
+
+    def PhaseUpdate(self):
+        starting = (self.phase == self.PRE_GAME) | (self.phase == self.STOPPAGE_GOAL)
+        if starting.any():
+            self.OnPlayStart(starting)
+
+        # everything but GAME_OVER ends up back in play or times out
+        active = self.phase != self.GAME_OVER
+        timeup = active & (self.tick >= self.rules.max_tick)
+        self.previous_phase = numpy.where(timeup, self.STOPPAGE_TIMEUP,
+                                          numpy.where(active, self.GAME_ON, self.previous_phase))
+        self.phase = numpy.where(timeup, self.GAME_OVER,
+                                 numpy.where(active, self.GAME_ON, self.phase))
+
+    def OnPlayStart(self, games):
+        self.position[games] = 0.0
+        self.velocity[games] = 0.0
+        self.input[games] = 0.0
+        self.action[games] = self.NONE
+        self.action_time[games] = 0
+
+        # InitPlayerPositions
+        num_games = int(games.sum())
+        r = self.rng.uniform(0, 0.5, (num_games, self.num_players)) ** self.init_exp
+        attack_z = self.attacking_net_position[:, 1]
+        z = attack_z * r - attack_z * (1.0 - r)
+        x = self.rng.integers(int(self.arena.min_x), int(self.arena.max_x),
+                              (num_games, self.num_players)).astype(float)
+        self.position[games] = numpy.stack([x, z], axis=-1)
+
+        # RandomlyGiveControl, alternating teams and picking a random player
+        team = (self.score[games].sum(axis=1)) % 2
+        team = numpy.where(self.team_sizes[team] == 0, TeamSide.Opposite(team), team)
+        pick = (self.rng.random(num_games) * self.team_sizes[team]).astype(int)
+        target = self.team_table[team, pick]
+        self.control[games] = target
+        game_indices = numpy.flatnonzero(games)
+        self.action_time[game_indices, target] = numpy.maximum(
+            self.action_time[game_indices, target], self.rules.receive_response_time)
+
+    def AIUpdate(self, actions, inputs):
+        # Player.Think, the controller sees the players after it as they were before thinking
+        previous_action, previous_action_time = self.action, self.action_time
+        self.action_time = numpy.maximum(0, self.action_time - 1)
+        stunned = self.action_time > 0
+        self.action = numpy.where(stunned, self.STUNNED, self.NONE)
+        self.input = numpy.zeros_like(self.input)
+        thinking = ~stunned
+
+        if len(self.agent_indices):
+            agent_thinking = thinking[:, self.agent_indices]
+            if actions is not None:
+                self.action[:, self.agent_indices] = numpy.where(
+                    agent_thinking, actions, self.action[:, self.agent_indices])
+            if inputs is not None:
+                self.input[:, self.agent_indices] = numpy.where(agent_thinking[..., None],
+                                                                inputs, 0.0)
+
+        self.NPCThink(thinking & ~self.is_agent, previous_action, previous_action_time)
+        self.input = kernels.RectifyInputKernel(self.input)
+
+    def RankByDistanceToController(self, dist):
+        """
+        Rank of every player within its own team by distance to the controller, ties broken by
+        name like DerivedState.ComputeDistanceRanks.
+        """
+        rank = numpy.empty(dist.shape, dtype=int)
+        for side in TeamSide.TEAMSIDES:
+            members = self.team_table[side, :self.team_sizes[side]]
+            if len(members) == 0:
+                continue
+            team_dist = dist[:, members]
+            order = numpy.lexsort(
+                (numpy.broadcast_to(self.name_rank[members], team_dist.shape), team_dist))
+            team_rank = numpy.empty_like(order)
+            numpy.put_along_axis(team_rank, order, numpy.arange(len(members))[None, :], axis=1)
+            rank[:, members] = team_rank
+        return rank
+
+    def NPCThink(self, npc, previous_action, previous_action_time):
+        """
+        SimplePlayer.custom_think for every NPC of every game at once. The scalar game thinks in
+        player order, so the controller's choice reads previous_action and previous_action_time,
+        the values from before this tick's Think, for the players after it.
+        """
+        games = numpy.arange(self.num_games)
+        players = numpy.arange(self.num_players)
+        position = self.position
+        control = self.control
+        control_position = position[games, control]
+        control_team = self.team_side[control]
+        control_net = self.attacking_net_position[control]
+        is_control = players[None, :] == control[:, None]
+        same_team = self.team_side[None, :] == control_team[:, None]
+
+        # teammates support the controller, opponents chase it
+        team_mean = numpy.stack(
+            [position[:, self.team_side == side].mean(axis=1) if self.team_sizes[side] else
+             numpy.zeros((self.num_games, 2)) for side in TeamSide.TEAMSIDES], axis=1)
+        support_input = kernels.SupportInputKernel(position, team_mean[:, self.team_side],
+                                                   self.attacking_net_position,
+                                                   self.arena.arena_size[0])
+        rank = self.RankByDistanceToController(
+            kernels.Norm(position - control_position[:, None, :]))
+        chase_input = kernels.ChaseInputKernel(position, rank, control_position[:, None, :],
+                                               control_net[:, None, :], npc_brain.CHASE_RANKS)
+
+        input = numpy.where(same_team[..., None], support_input, chase_input)
+        if SimplePlayer.RANDOM_SKATE_CHANCE > 0.0:
+            skate = self.rng.random(npc.shape) < SimplePlayer.RANDOM_SKATE_CHANCE
+            input = numpy.where(skate[..., None], 0.0, input)
+
+        # the controller heads for the net and shoots or passes when the odds are good
+        net_delta = control_net - control_position
+        input = numpy.where(is_control[..., None], net_delta[:, None, :], input)
+        self.input = numpy.where(npc[..., None], input, self.input)
+
+        deciding = numpy.flatnonzero(npc[games, control])
+        if len(deciding) == 0:
+            return
+        control = control[deciding]
+        control_position = control_position[deciding]
+        control_net = control_net[deciding]
+        control_team = control_team[deciding]
+
+        # capable defenders and the passing options, as (deciding games, team slots) tables
+        defenders = self.team_table[TeamSide.Opposite(control_team)]
+        defender_position = position[deciding[:, None], defenders]
+        thought = defenders < control[:, None]
+        action_time = numpy.where(thought, self.action_time[deciding[:, None], defenders],
+                                  previous_action_time[deciding[:, None], defenders])
+        capable = (defenders >= 0) & (action_time == 0)
+        teammates = self.team_table[control_team]
+        teammate_position = position[deciding[:, None], teammates]
+
+        net_dist = kernels.DotNorm(net_delta[deciding])
+        shoot_dist = SimplePlayer.SHOOT_ARENA_DIST * numpy.linalg.norm(
+            numpy.array(self.arena.arena_size))
+        through_chance, _ = kernels.InterceptKernel(self.rules, control_position, control_net,
+                                                    defender_position, capable)
+        shot_chance = through_chance * kernels.OnNetChanceKernel(self.rules, control_position,
+                                                                 control_net)
+        shoot = (SimplePlayer.RANDOM_SHOT_CHANCE == 0.0) & (net_dist < shoot_dist) & (
+                shot_chance > SimplePlayer.SHOT_CHANCE)
+        if SimplePlayer.RANDOM_SHOT_CHANCE > 0.0:
+            shoot |= self.rng.random(len(deciding)) < SimplePlayer.RANDOM_SHOT_CHANCE
+
+        slots = min(teammates.shape[1], len(Action.PASSES))
+        teammates = teammates[:, :slots]
+        teammate_position = teammate_position[:, :slots]
+        pass_chance, _ = kernels.InterceptKernel(
+            self.rules, numpy.broadcast_to(control_position[:, None, :], teammate_position.shape),
+            teammate_position, defender_position[:, None, :, :], capable[:, None, :])
+        teammate_action = numpy.where(teammates < control[:, None],
+                                      self.action[deciding[:, None], teammates],
+                                      previous_action[deciding[:, None], teammates])
+        can_receive = (teammates >= 0) & (teammates != control[:, None]) & (
+                teammate_action != self.STUNNED)
+        if SimplePlayer.RANDOM_PASS_CHANCE == 0.0:
+            passing = kernels.PassChoiceKernel(
+                net_dist, kernels.DotNorm(teammate_position - control_net[:, None, :]),
+                pass_chance, can_receive, SimplePlayer.PASS_CHANCE)
+        else:
+            passing = can_receive & (self.rng.random(can_receive.shape) <
+                                     SimplePlayer.RANDOM_PASS_CHANCE)
+        # the last pass wins
+        best = numpy.where(passing.any(axis=1), slots - 1 - numpy.argmax(passing[:, ::-1], axis=1),
+                           -1)
+
+        self.action[deciding, control] = numpy.where(
+            shoot, self.SHOOT, numpy.where(best >= 0, self.PASS_1 + best, self.NONE))
+
+    def LocomotionUpdate(self):
+        self.position, self.velocity = kernels.RunMotionModelKernel(
+            self.rules, self.position, self.velocity, self.input, self.action_time)
+        if self.rules.layout_constraint is Rules.LayoutConstraint.CROSSOVER_CONSTRAINT:
+            self.position = kernels.CrossoverConstraintKernel(self.arena, self.position,
+                                                              self.team_side, self.team_index)
+
+    def PhysicsUpdate(self):
+        self.position, self.velocity = kernels.BoardCollisionKernel(
+            self.arena, self.rules.player_radius, self.position, self.velocity)
+
+        touching = kernels.ContactMatrixKernel(self.rules.player_radius, self.position)
+        if self.rules.enable_player_collisions:
+            game, first, second = numpy.nonzero(touching)
+            flat_shape = (self.num_games * self.num_players, 2)
+            position, velocity = kernels.ResolveContactsKernel(
+                self.rules.player_radius, self.position.reshape(flat_shape),
+                self.velocity.reshape(flat_shape), game * self.num_players + first,
+                game * self.num_players + second)
+            self.position = position.reshape(self.position.shape)
+            self.velocity = velocity.reshape(self.velocity.shape)
+
+        # checks, visiting touching opponents in the same pair order as the scalar game
+        opponents = self.team_side[:, None] != self.team_side[None, :]
+        for first, second in zip(*numpy.nonzero((touching & opponents).any(axis=0))):
+            contact = touching[:, first, second]
+            check = contact & (self.control == first) & (self.action_time[:, second] == 0)
+            self.CompleteCheck(check, first, second)
+            check = contact & ~check & (self.control == second) & (
+                    self.action_time[:, first] == 0)
+            self.CompleteCheck(check, second, first)
+
+    def CompleteCheck(self, games, control_player, checking_player):
+        if not games.any():
+            return
+        if self.rules.check_stun_time > 0:
+            self.action[games, control_player] = self.STUNNED
+            self.action_time[games, control_player] = self.rules.check_stun_time
+        self.control[games] = checking_player
+        self.action_time[games, checking_player] = numpy.maximum(
+            self.action_time[games, checking_player], self.rules.receive_response_time)
+
+    def GiveControl(self, games, players):
+        self.control[games] = players
+        self.action_time[games, players] = numpy.maximum(self.action_time[games, players],
+                                                         self.rules.receive_response_time)
+
+    def ActionUpdate(self):
+        games = numpy.arange(self.num_games)
+        control = self.control
+        control_action = self.action[games, control]
+        control_team = self.team_side[control]
+        capable = (self.action_time == 0) & (self.team_side[None, :] != control_team[:, None])
+
+        pass_slot = control_action - self.PASS_1
+        pass_target = self.pass_targets[control_team, numpy.clip(pass_slot, 0, len(
+            Action.PASSES) - 1)]
+        passing = (pass_slot >= 0) & (pass_slot < len(Action.PASSES)) & (pass_target >= 0) & (
+                pass_target != control)
+        shooting = control_action == self.SHOOT
+
+        if shooting.any():
+            self.PlayerShot(games[shooting], control[shooting], capable[shooting])
+        if passing.any():
+            self.PlayerPass(games[passing], control[passing], pass_target[passing],
+                            capable[passing])
+
+    def PlayerShot(self, games, shooter, capable):
+        shooter_position = self.position[games, shooter]
+        net_position = self.attacking_net_position[shooter]
+        on_net = self.rng.random(len(games)) < kernels.OnNetChanceKernel(
+            self.rules, shooter_position, net_position)
+        _, interceptor = kernels.InterceptKernel(self.rules, shooter_position, net_position,
+                                                 self.position[games], capable,
+                                                 self.rng.random(capable.shape))
+
+        self.action_time[games, shooter] = numpy.maximum(self.action_time[games, shooter],
+                                                         self.rules.shot_response_time)
+
+        blocked = interceptor >= 0
+        self.GiveControl(games[blocked], interceptor[blocked])
+
+        goal = ~blocked & on_net
+        if goal.any():
+            scoring_team = self.team_side[shooter[goal]]
+            self.score[games[goal], scoring_team] += 1
+            self.previous_phase[games[goal]] = self.phase[games[goal]]
+            self.phase[games[goal]] = self.STOPPAGE_GOAL
+            self.reward[games[goal]] = numpy.where(
+                self.team_side[None, :] == scoring_team[:, None], self.GOAL_REWARD,
+                -self.GOAL_REWARD)
+
+        # missed shots give possession to the player closest to the net
+        missed = ~blocked & ~on_net
+        if missed.any():
+            net_dist = kernels.Norm(self.position[games[missed]] - net_position[missed][:, None, :])
+            self.GiveControl(games[missed], numpy.argmin(net_dist, axis=1))
+
+    def PlayerPass(self, games, source, target, capable):
+        _, interceptor = kernels.InterceptKernel(self.rules, self.position[games, source],
+                                                 self.position[games, target],
+                                                 self.position[games], capable,
+                                                 self.rng.random(capable.shape))
+        self.GiveControl(games, numpy.where(interceptor >= 0, interceptor, target))
+        self.action_time[games, source] = numpy.maximum(self.action_time[games, source],
+                                                        self.rules.pass_response_time)
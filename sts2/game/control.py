@@ -13,16 +13,14 @@ class Control:
         self.game = game
 
     def GiveControl(self, player):
-        index = self.game.team_players[player.team_side].index(player)
+        index = self.game.registry.GetTeamIndex(player)
         self.game.state.SetField(GameState.CONTROL_INDEX, index)
         self.game.state.SetField(GameState.CONTROL_TEAM, player.team_side)
         self.game.game_event_history.AddEvent(
             GameEvent(self.game.tick, STS2Event.GAIN_CONTROL, player.name, ''))
 
     def GetControl(self):
-        control_team = int(self.game.state.GetField(GameState.CONTROL_TEAM))
-        control_player = int(self.game.state.GetField(GameState.CONTROL_INDEX))
-        return self.game.team_players[control_team][control_player]
+        return self.game.derived.GetController()
 
     def HasControl(self, player):
         return player is self.GetControl()
@@ -0,0 +1,105 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import numpy
+
+from sts2.game import kernels
+from sts2.game.game_state import GameState
+from sts2.game.settings import TeamSide
+
+
+class DerivedState:
+    """
+    Quantities derived from the game state that many consumers need during a tick.
+    Every value is computed on first use and kept until the GameState revision counters it
+    depends on change, so positions or control moving invalidates it automatically.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.state = game.state
+        self.registry = game.registry
+        self.team_indices = game.registry.team_indices
+        self.cache = {}
+
+    def Get(self, name, revisions, compute):
+        entry = self.cache.get(name)
+        if entry is None or entry[0] != revisions:
+            entry = (revisions, compute())
+            self.cache[name] = entry
+        return entry[1]
+
+    def GetController(self):
+        return self.Get('controller', self.state.control_revision, self.ComputeController)
+
+    def ComputeController(self):
+        control_team = int(self.state.GetField(GameState.CONTROL_TEAM))
+        control_index = int(self.state.GetField(GameState.CONTROL_INDEX))
+        return self.game.team_players[control_team][control_index]
+
+    def GetDistanceMatrix(self):
+        """ (players, players) distances in game.players order. """
+        return self.Get('distance_matrix', self.state.position_revision,
+                        self.ComputeDistanceMatrix)
+
+    def ComputeDistanceMatrix(self):
+        positions = self.state.positions
+        return kernels.Norm(positions[:, None, :] - positions[None, :, :])
+
+    def GetTeamCentroids(self):
+        """ (2, 2) mean position of each team. """
+        return self.Get('team_centroids', self.state.position_revision,
+                        self.ComputeTeamCentroids)
+
+    def ComputeTeamCentroids(self):
+        centroids = numpy.zeros((TeamSide.NUM_TEAMSIDES, 2))
+        for team_side in TeamSide.TEAMSIDES:
+            indices = self.team_indices[team_side]
+            if len(indices):
+                centroids[team_side] = self.state.positions[indices].mean(axis=0)
+        return centroids
+
+    def GetNetDistances(self):
+        """ (2, players) distance of every player to each team's net. """
+        return self.Get('net_distances', self.state.position_revision, self.ComputeNetDistances)
+
+    def ComputeNetDistances(self):
+        nets = numpy.array(self.game.arena.net_position)
+        return kernels.Norm(self.state.positions[None, :, :] - nets[:, None, :])
+
+    def GetCapableMask(self):
+        """ (players,) mask of the players free to act, i.e. with no action time left. """
+        return self.Get('capable_mask', self.state.action_time_revision,
+                        lambda: self.state.action_times == 0)
+
+    def GetCapableTeamPlayers(self, team):
+        return self.Get(('capable_team_players', team), self.state.action_time_revision,
+                        lambda: [player for player, capable in
+                                 zip(self.game.team_players[team],
+                                     self.GetCapableMask()[self.team_indices[team]]) if
+                                 capable])
+
+    def GetDistanceRanks(self):
+        """
+        Rank of every player within its team by distance to the controller, ties broken by name,
+        as {team_side: {player name: rank}}.
+        """
+        return self.Get('distance_ranks',
+                        (self.state.position_revision, self.state.control_revision),
+                        self.ComputeDistanceRanks)
+
+    def GetDistanceRankArray(self):
+        """ GetDistanceRanks as a (players,) array in game.players order. """
+        return self.Get('distance_rank_array',
+                        (self.state.position_revision, self.state.control_revision),
+                        lambda: numpy.array([self.GetDistanceRanks()[player.team_side][player.name]
+                                             for player in self.game.players]))
+
+    def ComputeDistanceRanks(self):
+        controller = self.registry.GetGlobalIndex(self.GetController())
+        distances = self.GetDistanceMatrix()[controller]
+        ranks = {}
+        for team_side in TeamSide.TEAMSIDES:
+            entries = sorted((distances[i], self.game.players[i].name) for i in
+                             self.team_indices[team_side])
+            ranks[team_side] = {name: rank for rank, (_, name) in enumerate(entries)}
+        return ranks
@@ -9,49 +9,98 @@ reinforcement data and validating RL and IL methods will be much quicker.
 Once discovered we can apply them to the full title.
 """
 
+import copy
 import numpy
-import random
 
-from sts2.game.simulation import Simulation, GameEvent
+from sts2.game.simulation import Simulation, GameEvent, GameEventHistory, HistoryPolicy
 from sts2.game.arena import Arena
 from sts2.game.control import Control
+from sts2.game.derived_state import DerivedState
+from sts2.game import kernels
 from sts2.game.game_state import GameState, Action
+from sts2.game import npc_brain
 from sts2.game.physics import Physics
+from sts2.game.player_registry import PlayerRegistry
+from sts2.game.recording import EpisodeRecorder
 from sts2.game.rules import Rules, STANDARD_GAME_RULES
 from sts2.game.settings import GamePhase, STS2Event, Outputs, TeamSide
 
 
+class SavedGameState:
+    """ Everything Game.restore_state needs to roll a game back, see Game.save_state. """
+
+    def __init__(self, values):
+        self.values = values
+        self.text = None
+        self.tick = 0
+        self.random_state = None
+        self.event_cursor = None
+        self.episode_over = False
+
+
 class Game(Simulation):
     GOAL_REWARD = 1.0
 
-    def __init__(self, players, rules=None, verbosity=0, client_adapter_cls=None):
-        super(Game, self).__init__(players, verbosity)
+    def __init__(self, players, rules=None, verbosity=0, client_adapter_cls=None,
+                 history_policy=None, seed=None):
+        super(Game, self).__init__(players, verbosity, history_policy)
+        # every random draw of the game and its players comes from here, see Seed
+        self.rng = None
+        self.Seed(seed)
         self.client_adapter = client_adapter_cls(self)
         self.team_players = []
         self.team_players.append([x for x in players if x.team_side == TeamSide.HOME])
         self.team_players.append([x for x in players if x.team_side == TeamSide.AWAY])
+        self.registry = PlayerRegistry(players, self.team_players)
         if rules is None:
             rules = STANDARD_GAME_RULES
         self.rules = rules
         self.arena = Arena(rules.arena_size)
         self.physics = Physics(self)
+        self.attacking_net_positions = numpy.array(
+            [player.GetAttackingNetPos(self) for player in players]).reshape(-1, 2)
+        # per player constants of the array code, in game.players order
+        self.player_team_sides = numpy.array([player.team_side for player in players], dtype=int)
+        self.player_team_indices = numpy.array(
+            [self.registry.GetTeamIndex(player) for player in players], dtype=int)
+        # thinks for all SimplePlayers at once, None runs Player.Think one player at a time
+        self.npc_brain = npc_brain.NPCBrain(self)
+        if len(self.npc_brain.npc_indices) < npc_brain.MIN_NPCS:
+            self.npc_brain = None
 
         self.state = GameState(self)
         self.control = Control(self)
-        self.state.SetField(GameState.PREVIOUS_PHASE, GamePhase.PRE_GAME, init=True)
-        self.state.SetField(GameState.CURRENT_PHASE, GamePhase.PRE_GAME, init=True)
+        self.derived = DerivedState(self)
+        # columnar per tick history, replaces the list of GameHistoryEntry
+        self.game_state_history = EpisodeRecorder(self)
+
+        self.profiler = None  # see SetProfiler
 
         # More of the MAS additions
         self.players_by_distance_to_controller_by_team = {}
         self.init_exp = 1.0
 
+    def Seed(self, seed):
+        """
+        Restarts the random stream from seed, an int or a numpy SeedSequence. None takes fresh
+        entropy, so unseeded games are independent of each other.
+        """
+        if not isinstance(seed, numpy.random.SeedSequence):
+            seed = numpy.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.rng = numpy.random.default_rng(seed)
+
+    def SetProfiler(self, profiler):
+        """ Times the tick stages with a profiler.TickProfiler, None turns it off again. """
+        if self.profiler is not None:
+            self.profiler.Detach(self)
+        self.profiler = profiler
+        if profiler is not None:
+            profiler.Attach(self)
+
     def CustomTick(self):
         vb = max(0, self.verbosity - 1)
 
-        # from base class but we want it logged
-        self.state.series = self.state.series.copy()
-        self.state.series.tick = self.tick
-
         self.player_action_list = [None] * len(self.players)
         self.player_reward_list = [0.0] * len(self.players)
         self.player_policy_list = [None] * len(self.players)
@@ -77,21 +126,21 @@ class Game(Simulation):
 
     def InitPlayerPositions(self):
         for player in self.players:
-            # r = numpy.random.random()
-            r = numpy.random.uniform(0, 0.5)
+            # r = self.rng.random()
+            r = self.rng.uniform(0, 0.5)
             r = r ** self.init_exp
             attack_z = player.GetAttackingNetPos(self)[1]
             z = attack_z * r - attack_z * (1.0 - r)
             player.SetPosition(self, numpy.array(
-                [float(numpy.random.randint(self.arena.min_x, self.arena.max_x)), z]))
+                [float(self.rng.integers(self.arena.min_x, self.arena.max_x)), z]))
 
     def RandomlyGiveControl(self):
         # random player seemed to mostly pick the first player
         # now alternating teams and picking random player
-        team = int((self.state.series.home_score + self.state.series.away_score)) % 2
+        team = int(self.GetScore(TeamSide.HOME) + self.GetScore(TeamSide.AWAY)) % 2
         if len(self.team_players[team]) == 0:
             team = TeamSide.Opposite(team)
-        target = random.choice(self.team_players[team])
+        target = self.team_players[team][self.rng.integers(len(self.team_players[team]))]
         self.control.GiveControl(target)
         target.ResponseTime(self, self.rules.receive_response_time)
 
@@ -122,6 +171,7 @@ class Game(Simulation):
 
     def PhaseUpdate(self, verbosity):
         if self.GetGamePhase() == GamePhase.PRE_GAME:
+            self.StartEpisode()
             self.SetGamePhase(GamePhase.START_PLAY, verbosity)
             self.game_event_history.AddEvent(
                 GameEvent(self.tick, STS2Event.GAME_START, '', ''))
@@ -140,6 +190,7 @@ class Game(Simulation):
                 # this just clears out the "previous_phase" properly
                 self.SetGamePhase(GamePhase.GAME_ON, verbosity)
         elif self.GetGamePhase() == GamePhase.STOPPAGE_GOAL:
+            self.StartEpisode()
             self.SetGamePhase(GamePhase.START_PLAY, verbosity)
             self.PhaseUpdate(verbosity)
         elif self.GetGamePhase() == GamePhase.STOPPAGE_TIMEUP:
@@ -196,59 +247,36 @@ class Game(Simulation):
 
     def sort_by_distance_to_controller(self):
         """ Sort all players by team and distance to the puck owner aka 'controller'. """
-        self.players_by_distance_to_controller_by_team = {0: [], 1: []}
-        control_player = self.control.GetControl()
-        puck_position = control_player.GetPosition(self)
-        for player in self.players:
-            dist = numpy.linalg.norm(puck_position - player.GetPosition(self))
-            self.players_by_distance_to_controller_by_team[player.team_side].append(
-                (dist, player.name))
-        self.players_by_distance_to_controller_by_team[0] = {
-            entry[1]: ii for ii, entry in
-            enumerate(sorted(self.players_by_distance_to_controller_by_team[0]))
-        }
-        self.players_by_distance_to_controller_by_team[1] = {
-            entry[1]: ii for ii, entry in
-            enumerate(sorted(self.players_by_distance_to_controller_by_team[1]))
-        }
+        self.players_by_distance_to_controller_by_team = self.derived.GetDistanceRanks()
 
     def AIUpdate(self, verbosity):
         self.sort_by_distance_to_controller()
+        if self.npc_brain is not None and not verbosity:
+            self.npc_brain.Think(self, verbosity)
+        else:
+            # one player at a time, the players explain their decisions when verbose
+            for player in self.players:
+                player.Think(self, verbosity)
         for i, player in zip(range(len(self.players)), self.players):
-            player.Think(self, verbosity)
             self.player_action_list[i], self.player_policy_list[i], self.player_value_estimate_list[
                 i] = self.PlayerDecisionsToRLStates(player)
 
     def LocomotionUpdate(self, verbosity):
-        for player in self.players:
-            control_input = player.GetInput(self)
-            player.RunMotionModel(self, control_input, player.GetActionTime(self))
-            if self.rules.layout_constraint is Rules.LayoutConstraint.CROSSOVER_CONSTRAINT:
-                i = player.GetTeamIndex(self)
-                x1 = 0.2
-                x2 = 0.6
-                y1 = 0.0
-                y2 = 1.0
-
-                # mirror for 2nd player
-                if i % 2:
-                    x1, x2 = 1.0 - x1, 1.0 - x2
-
-                x, y = self.arena.GetNormalizedCoord(player.GetPosition(self))
-
-                if player.team_side == TeamSide.AWAY:
-                    x, y = 1.0 - x, 1.0 - y
-
-                x_prime = x1 + (x2 - x1) * y / (y2 - y1)
-
-                if player.team_side == TeamSide.AWAY:
-                    x_prime, y = 1.0 - x_prime, 1.0 - y
-
-                constrained_pos = self.arena.GetArenaCoordFromNormalized(numpy.array([x_prime, y]))
-                player.SetPosition(self, constrained_pos)
+        # every player's Player.RunMotionModel and layout constraint at once, on the state views
+        state = self.state
+        position, velocity = kernels.RunMotionModelKernel(self.rules, state.positions,
+                                                          state.velocities, state.inputs,
+                                                          state.action_times)
+        if self.rules.layout_constraint is Rules.LayoutConstraint.CROSSOVER_CONSTRAINT:
+            position = kernels.CrossoverConstraintKernel(self.arena, position,
+                                                         self.player_team_sides,
+                                                         self.player_team_indices)
+        state.positions[...] = position
+        state.velocities[...] = velocity
+        state.MarkPositionsChanged()
 
     def GetCapableTeamPlayers(self, team):
-        return [player for player in self.team_players[team] if player.GetActionTime(self) == 0]
+        return self.derived.GetCapableTeamPlayers(team)
 
     def ComputeOnNetChance(self, player):
         net_delta = player.GetAttackingNetPos(self) - player.GetPosition(self)
@@ -259,12 +287,58 @@ class Game(Simulation):
         # print('shot', net_delta, net_dir, shot_directness_chance, shot_distance_chance, shot_directness_chance * shot_distance_chance)
         return shot_directness_chance * shot_distance_chance
 
+    def GetShotPassEvaluation(self):
+        """
+        Shot chances of every player and the pass through chance of every (source, target) pair,
+        against the capable players of the team without control. Pure: nothing is sampled, so
+        evaluating never moves the random stream. Cached in the derived state until positions,
+        action times or control change, so repeated queries within a tick cost nothing.
+        """
+        defending_team = TeamSide.Opposite(self.control.GetControl().team_side)
+
+        def Compute():
+            positions = self.state.positions
+            nets = self.attacking_net_positions
+            on_net_chance = kernels.OnNetChanceKernel(self.rules, positions, nets)
+            # the shots and every source to target pass in one kernel call
+            targets = numpy.concatenate([nets[:, None, :], positions[None, :, :].repeat(
+                len(positions), axis=0)], axis=1)
+            through_chance = self.physics.InterceptChances(positions[:, None, :], targets,
+                                                           defending_team)
+            return through_chance[:, 0] * on_net_chance, through_chance[:, 1:]
+
+        return self.derived.Get(('shot_pass_evaluation', defending_team),
+                                (self.state.position_revision, self.state.action_time_revision),
+                                Compute)
+
+    def ShotSuccessProbability(self, player):
+        shots, _ = self.GetShotPassEvaluation()
+        return float(shots[self.registry.GetGlobalIndex(player)])
+
+    def PassSuccessProbability(self, source_player, target_player):
+        _, passes = self.GetShotPassEvaluation()
+        return float(passes[self.registry.GetGlobalIndex(source_player),
+                            self.registry.GetGlobalIndex(target_player)])
+
+    def EvaluateShots(self, players):
+        """ Shot success chance of each of players, see GetShotPassEvaluation. """
+        shots, _ = self.GetShotPassEvaluation()
+        return shots[[self.registry.GetGlobalIndex(player) for player in players]]
+
+    def EvaluatePasses(self, source_player, target_players):
+        """ Through chance of a pass from the controller to each of target_players. """
+        assert (self.control.GetControl() is source_player)
+        _, passes = self.GetShotPassEvaluation()
+        return passes[self.registry.GetGlobalIndex(source_player),
+                      [self.registry.GetGlobalIndex(player) for player in target_players]]
+
     def PlayerShot(self, player, simulate, verbosity):
-        if not simulate:
-            assert (self.control.GetControl() is player)
+        if simulate:
+            return self.ShotSuccessProbability(player)
+        assert (self.control.GetControl() is player)
 
         on_net_chance = self.ComputeOnNetChance(player)
-        on_net = random.random() < on_net_chance
+        on_net = self.rng.random() < on_net_chance
 
         interceptor, through_chance = self.physics.InterceptTest(player.GetPosition(self),
                                                                  player.GetAttackingNetPos(self),
@@ -273,67 +347,60 @@ class Game(Simulation):
                                                                          self.control.GetControl().team_side)),
                                                                  max(0, verbosity - 1))
 
-        if not simulate:
-            self.game_event_history.AddEvent(
-                GameEvent(self.tick, STS2Event.SHOT, player.name, ''))
+        self.game_event_history.AddEvent(
+            GameEvent(self.tick, STS2Event.SHOT, player.name, ''))
 
-            player.ResponseTime(self, self.rules.shot_response_time)
+        player.ResponseTime(self, self.rules.shot_response_time)
 
-            if interceptor:
-                self.game_event_history.AddEvent(
-                    GameEvent(self.tick, STS2Event.SHOT_BLOCK, interceptor.name, player.name))
-                self.control.GiveControl(interceptor)
-                interceptor.ResponseTime(self, self.rules.receive_response_time)
+        if interceptor:
+            self.game_event_history.AddEvent(
+                GameEvent(self.tick, STS2Event.SHOT_BLOCK, interceptor.name, player.name))
+            self.control.GiveControl(interceptor)
+            interceptor.ResponseTime(self, self.rules.receive_response_time)
+        else:
+            if on_net:
+                self.AwardGoal(player)
+                self.control.Reset(self)
             else:
-                if on_net:
-                    self.AwardGoal(player)
-                    self.control.Reset(self)
-                else:
-                    self.game_event_history.AddEvent(
-                        GameEvent(self.tick, STS2Event.MISSED_SHOT, player.name, ''))
-
-                    # give possession to closest player
-                    attacking_net_pos = player.GetAttackingNetPos(self)
-                    min_dist = None
-                    rebound_player = None
-                    for player in self.players:
-                        # project player onto trajectory to find unconstrained intercept point
-                        dist = numpy.linalg.norm(player.GetPosition(self) - attacking_net_pos)
-                        if min_dist is None or dist < min_dist:
-                            min_dist = dist
-                            rebound_player = player
-
-                    self.control.GiveControl(rebound_player)
-                    rebound_player.ResponseTime(self, self.rules.receive_response_time)
+                self.game_event_history.AddEvent(
+                    GameEvent(self.tick, STS2Event.MISSED_SHOT, player.name, ''))
+
+                # give possession to closest player
+                net_distances = self.derived.GetNetDistances()[TeamSide.Opposite(player.team_side)]
+                rebound_player = self.players[int(numpy.argmin(net_distances))]
+
+                self.control.GiveControl(rebound_player)
+                rebound_player.ResponseTime(self, self.rules.receive_response_time)
 
         return through_chance * on_net_chance
 
     def PlayerPass(self, source_player, target_player, simulate, verbosity):
         assert (self.control.GetControl() is source_player)
+        if simulate:
+            return self.PassSuccessProbability(source_player, target_player)
         interceptor, through_chance = self.physics.InterceptTest(source_player.GetPosition(self),
                                                                  target_player.GetPosition(self),
                                                                  self.GetCapableTeamPlayers(
                                                                      TeamSide.Opposite(
                                                                          self.control.GetControl().team_side)),
                                                                  max(0, verbosity - 1))
-        if not simulate:
-            self.game_event_history.AddEvent(
-                GameEvent(self.tick, STS2Event.PASS, source_player.name, target_player.name))
+        self.game_event_history.AddEvent(
+            GameEvent(self.tick, STS2Event.PASS, source_player.name, target_player.name))
 
-            if interceptor:
-                self.game_event_history.AddEvent(
-                    GameEvent(self.tick, STS2Event.PASS_INTERCEPT, interceptor.name,
-                              source_player.name))
-                self.control.GiveControl(interceptor)
-                interceptor.ResponseTime(self, self.rules.receive_response_time)
-            else:
-                self.game_event_history.AddEvent(
-                    GameEvent(self.tick, STS2Event.PASS_COMPLETE, target_player.name,
-                              source_player.name))
-                self.control.GiveControl(target_player)
-                target_player.ResponseTime(self, self.rules.receive_response_time)
+        if interceptor:
+            self.game_event_history.AddEvent(
+                GameEvent(self.tick, STS2Event.PASS_INTERCEPT, interceptor.name,
+                          source_player.name))
+            self.control.GiveControl(interceptor)
+            interceptor.ResponseTime(self, self.rules.receive_response_time)
+        else:
+            self.game_event_history.AddEvent(
+                GameEvent(self.tick, STS2Event.PASS_COMPLETE, target_player.name,
+                          source_player.name))
+            self.control.GiveControl(target_player)
+            target_player.ResponseTime(self, self.rules.receive_response_time)
 
-            source_player.ResponseTime(self, self.rules.pass_response_time)
+        source_player.ResponseTime(self, self.rules.pass_response_time)
         return through_chance
 
     def CompleteCheck(self, control_player, checking_player):
@@ -382,7 +449,88 @@ class Game(Simulation):
         pass
 
     def GetHashableGameStateVector(self):
-        return self.state.series
+        return self.state.GetFrame()
+
+    def IsEpisodeOver(self):
+        return self.GetGamePhase() == GamePhase.GAME_OVER
+
+    def _AddGameStateHistoryForThisTick(self):
+        self.game_state_history.Append()
+
+    def _ClearGameStateHistory(self):
+        self.game_state_history.Clear()
+
+    def GetRandomState(self):
+        return self.rng.bit_generator.state
+
+    def SetRandomState(self, random_state):
+        self.rng.bit_generator.state = random_state
+
+    def save_state(self, token=None):
+        """
+        Captures the state vector, tick, random state and event history position, e.g. before
+        expanding a search node. Passing a token from an earlier call reuses its buffer, so
+        saving is a single copy into preallocated memory.
+        """
+        if token is None:
+            token = SavedGameState(self.state.values.copy())
+        else:
+            numpy.copyto(token.values, self.state.values)
+        token.text = self.state.text  # replaced, never mutated, on writes
+        token.tick = self.tick
+        token.random_state = self.GetRandomState()
+        token.event_cursor = self.game_event_history.GetCursor()
+        token.episode_over = self.episode_over
+        return token
+
+    def restore_state(self, token):
+        """
+        Rolls the game back to a save_state token. The event history goes back to the save point,
+        also when a new episode or spill dropped its events since; the tick history is left
+        alone. A token can be restored any number of times, restoring it invalidates the tokens
+        saved after it.
+        """
+        numpy.copyto(self.state.values, token.values)
+        self.state.text = token.text
+        self.state.MarkChanged()
+        self.tick = token.tick
+        self.SetRandomState(token.random_state)
+        self.game_event_history.Truncate(token.event_cursor)
+        self.SetEpisodeOver(token.episode_over)
+
+    def fork(self, history_policy=None, seed=None):
+        """
+        Independent copy of the running game for lookahead. Rules, arena, players and registry
+        are shared, the state vector is copied, and the fork starts with empty histories that
+        record nothing unless history_policy says otherwise. Without a seed the fork continues
+        a copy of this game's random stream, so it replays the same future until they diverge.
+        """
+        game = copy.copy(self)
+        if seed is None:
+            game.rng = numpy.random.default_rng(self.seed_sequence)
+            game.SetRandomState(self.GetRandomState())
+        else:
+            game.Seed(seed)
+        game.history_policy = history_policy if history_policy is not None else HistoryPolicy(
+            HistoryPolicy.OFF)
+        game.player_action_list = list(self.player_action_list)
+        game.player_reward_list = list(self.player_reward_list)
+        game.player_policy_list = list(self.player_policy_list)
+        game.player_value_estimate_list = list(self.player_value_estimate_list)
+        game.game_event_history = GameEventHistory(game.history_policy)
+        game.state = self.state.Fork(game)
+        game.client_adapter = self.client_adapter.Fork(game)
+        game.physics = Physics(game)
+        game.control = Control(game)
+        game.derived = DerivedState(game)
+        game.game_state_history = EpisodeRecorder(game, capacity=1)
+        game.SetEpisodeOver(self.episode_over and
+                            game.history_policy.mode == HistoryPolicy.EPISODE)
+        if self.profiler is not None:
+            # the copied wrappers time the methods of this game, not the fork's
+            self.profiler.Detach(game)
+            game.profiler = None
+        return game
 
     def DrawArena(self, vb):
         if not vb:
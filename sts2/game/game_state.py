@@ -1,10 +1,10 @@
 # Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
 
+import copy
 
-import pandas
 import numpy
 
-from sts2.game.settings import TeamSide
+from sts2.game.settings import GamePhase, TeamSide
 
 
 class Action:
@@ -22,6 +22,13 @@ class Action:
     NUM = len(ACTION_LIST)
 
 
+class FieldKind:
+    FLOAT = 0
+    INT = 1
+    ENUM = 2  # stored as an index into a fixed list of strings, e.g. phases and actions
+    TEXT = 3  # static strings such as player names, kept outside the numeric vector
+
+
 class GameState:
     TICK = "tick"
 
@@ -61,9 +68,42 @@ class GameState:
 
     def __init__(self, game):
         self.game = game
-        self.series = pandas.Series()
+        self.layout = GameStateLayout(game.registry)
+        # every numeric field lives in this one vector, it is never rebound so views stay valid
+        self.values = numpy.zeros(self.layout.num_slots)
+        self.text = {}
+        # first slot of each player's block, looked up by player identity
+        self.player_slots = {entry.player: self.layout.PlayerBaseSlot(entry.global_index)
+                             for entry in game.registry.entry_list}
+        self.BindViews()
+        # bumped by every write that can move a player, change control or change action times,
+        # DerivedState compares them to know when its caches are stale
+        self.position_revision = 0
+        self.control_revision = 0
+        self.action_time_revision = 0
         self.Init()
 
+    def BindViews(self):
+        # (players, ...) views of the roster in game.players order, for array code
+        self.player_block = self.layout.PlayerBlock(self.values)
+        self.positions = self.player_block[:, GameStateLayout.POS_OFFSET:
+                                              GameStateLayout.POS_OFFSET + 2]
+        self.velocities = self.player_block[:, GameStateLayout.VEL_OFFSET:
+                                               GameStateLayout.VEL_OFFSET + 2]
+        self.inputs = self.player_block[:, GameStateLayout.INPUT_OFFSET:
+                                           GameStateLayout.INPUT_OFFSET + 2]
+        # Action.ACTION_LIST indices
+        self.actions = self.player_block[:, GameStateLayout.ACTION_OFFSET]
+        self.action_times = self.player_block[:, GameStateLayout.ACTION_TIME_OFFSET]
+
+    def Fork(self, game):
+        """ Independent copy of the values for a forked game, the layout is shared. """
+        state = copy.copy(self)
+        state.game = game
+        state.values = self.values.copy()
+        state.BindViews()
+        return state
+
     def Init(self):
         # static values that don't change
         # WARNING: assumes home and away don't switch sides
@@ -97,20 +137,65 @@ class GameState:
             self.SetPlayerField(player, self.PLAYER_ACTION, Action.NONE, init=True)
             self.SetPlayerField(player, self.PLAYER_ACTION_TIME, 0, init=True)
 
+        self.SetField(self.PREVIOUS_PHASE, GamePhase.PRE_GAME, init=True)
+        self.SetField(self.CURRENT_PHASE, GamePhase.PRE_GAME, init=True)
+
+    @property
+    def series(self):
+        """pandas view of the current state, built on demand (writes do not propagate back)."""
+        return self.GetFrame().ToSeries()
+
+    def MarkChanged(self):
+        # call after writing self.values directly
+        self.position_revision += 1
+        self.control_revision += 1
+        self.action_time_revision += 1
+
+    def MarkPositionsChanged(self):
+        # call after writing self.positions directly
+        self.position_revision += 1
+
+    def MarkActionTimesChanged(self):
+        # call after writing self.action_times directly
+        self.action_time_revision += 1
+
+    def GetFieldNames(self):
+        return self.layout.field_names
+
+    def GetFrame(self):
+        """Detached copy of the current state, cheap enough to keep one per tick."""
+        return GameStateFrame(self.layout, self.values.copy(), self.text)
+
     def GetSnapshot(self):  # MAS, generic OpenAI-like use
-        return {field: self.series[field] for field in self.series.index}
+        return self.layout.Decode(self.values, self.text)
 
     def SetFromSnapshot(self, json_data):  # MAS, used for MCTS load game state
-        """No asserts, assuming json_data matches the columns."""
-        for field, value in json_data:
-            self.series[field] = value
+        """
+        Sets every field from a GetSnapshot dict or Series in one pass. For search prefer
+        Game.save_state and Game.restore_state, which skip the encoding.
+        """
+        self.text = self.layout.Encode(json_data, self.values)
+        self.MarkChanged()
 
     def GetField(self, field):
-        return self.series[field]
+        slot = self.layout.slots.get(field)
+        if slot is None:
+            return self.text[field]
+        return self.layout.DecodeSlot(slot, self.values[slot])
 
     def SetField(self, field, value, init=False):
-        assert (init or field in self.series)
-        self.series[field] = value
+        # the layout is fixed when the game is built, so init only documents intent now
+        assert (field in self.layout.kinds)
+        slot = self.layout.slots.get(field)
+        if slot is None:
+            # copy on write so frames already handed out keep their names
+            self.text = dict(self.text)
+            self.text[field] = value
+        else:
+            self.values[slot] = self.layout.EncodeSlot(slot, value)
+            revision = self.layout.slot_revisions[slot]
+            if revision is not None:
+                setattr(self, revision, getattr(self, revision) + 1)
 
     def GetTeamFieldPrefix(self, teamside):
         return TeamSide.GetName(teamside)
@@ -122,51 +207,229 @@ class GameState:
         return self.GetField(self.GetTeamFieldName(teamside, field))
 
     def SetTeamField(self, teamside, field, value, init=False):
-        field_name = self.GetTeamFieldPrefix(teamside) + field
-        assert (init or field_name in self.series)
-        self.series[field_name] = value
+        self.SetField(self.GetTeamFieldName(teamside, field), value, init)
 
     def GetPlayerFieldPrefix(self, player):
-        team_index = self.game.team_players[player.team_side].index(player)
-        return TeamSide.GetName(player.team_side) + str(team_index)
+        return self.game.registry.GetPrefix(player)
+
+    def GetPlayerSlot(self, player, field):
+        return self.player_slots[player] + GameStateLayout.PLAYER_OFFSETS[field]
 
     def GetPlayerField(self, player, field):
-        return self.series[self.GetPlayerFieldPrefix(player) + field]
+        offset = GameStateLayout.PLAYER_OFFSETS.get(field)
+        if offset is None:
+            return self.GetField(self.game.registry.GetFieldName(player, field))
+        slot = self.player_slots[player] + offset
+        return self.layout.DecodeSlot(slot, self.values[slot])
 
     def SetPlayerField(self, player, field, value, init=False):
-        field_name = self.GetPlayerFieldPrefix(player) + field
-
-        # ensure we are not adding incorrect fields through assignment
-        assert (init or field_name in self.series)
-
-        self.series[field_name] = value
+        offset = GameStateLayout.PLAYER_OFFSETS.get(field)
+        if offset is None:
+            # ensure we are not adding incorrect fields through assignment
+            self.SetField(self.game.registry.GetFieldName(player, field), value, init)
+            return
+        slot = self.player_slots[player] + offset
+        value = self.layout.EncodeSlot(slot, value)
+        if offset == GameStateLayout.ACTION_TIME_OFFSET and self.values[slot] != value:
+            self.action_time_revision += 1
+        self.values[slot] = value
 
     def GetPlayerPosition(self, player):
-        prefix = self.GetPlayerFieldPrefix(player)
-        return numpy.array(
-            [self.series[prefix + self.PLAYER_POS_X], self.series[prefix + self.PLAYER_POS_Z]])
+        slot = self.player_slots[player] + GameStateLayout.POS_OFFSET
+        return self.values[slot:slot + 2].copy()
 
     def SetPlayerPosition(self, player, pos):
-        prefix = self.GetPlayerFieldPrefix(player)
-        self.series[prefix + self.PLAYER_POS_X] = pos[0]
-        self.series[prefix + self.PLAYER_POS_Z] = pos[1]
+        slot = self.player_slots[player] + GameStateLayout.POS_OFFSET
+        self.values[slot:slot + 2] = pos
+        self.position_revision += 1
 
     def GetPlayerVelocity(self, player):
-        prefix = self.GetPlayerFieldPrefix(player)
-        return numpy.array(
-            [self.series[prefix + self.PLAYER_VEL_X], self.series[prefix + self.PLAYER_VEL_Z]])
+        slot = self.player_slots[player] + GameStateLayout.VEL_OFFSET
+        return self.values[slot:slot + 2].copy()
 
     def SetPlayerVelocity(self, player, pos):
-        prefix = self.GetPlayerFieldPrefix(player)
-        self.series[prefix + self.PLAYER_VEL_X] = pos[0]
-        self.series[prefix + self.PLAYER_VEL_Z] = pos[1]
+        slot = self.player_slots[player] + GameStateLayout.VEL_OFFSET
+        self.values[slot:slot + 2] = pos
 
     def GetPlayerInput(self, player):
-        prefix = self.GetPlayerFieldPrefix(player)
-        return numpy.array(
-            [self.series[prefix + self.PLAYER_INPUT_X], self.series[prefix + self.PLAYER_INPUT_Z]])
+        slot = self.player_slots[player] + GameStateLayout.INPUT_OFFSET
+        return self.values[slot:slot + 2].copy()
 
     def SetPlayerInput(self, player, pos):
-        prefix = self.GetPlayerFieldPrefix(player)
-        self.series[prefix + self.PLAYER_INPUT_X] = pos[0]
-        self.series[prefix + self.PLAYER_INPUT_Z] = pos[1]
+        slot = self.player_slots[player] + GameStateLayout.INPUT_OFFSET
+        self.values[slot:slot + 2] = pos
+
+
+class GameStateLayout:
+    """
+    Assigns every numeric state field an integer slot in one contiguous float64 vector.
+    Player fields are stored in fixed-stride blocks, one per player in game.players order, so the
+    roster can be addressed as a (players, PLAYER_STRIDE) view of the state vector.
+    The layout depends only on the rosters and never changes once the game is built.
+    """
+    PLAYER_BLOCK = [GameState.PLAYER_IS_HUMAN, GameState.PLAYER_POS_X, GameState.PLAYER_POS_Z,
+                    GameState.PLAYER_VEL_X, GameState.PLAYER_VEL_Z, GameState.PLAYER_INPUT_X,
+                    GameState.PLAYER_INPUT_Z, GameState.PLAYER_ACTION,
+                    GameState.PLAYER_ACTION_TIME]
+    PLAYER_STRIDE = len(PLAYER_BLOCK)
+    PLAYER_OFFSETS = {field: i for i, field in enumerate(PLAYER_BLOCK)}
+    POS_OFFSET = PLAYER_OFFSETS[GameState.PLAYER_POS_X]
+    VEL_OFFSET = PLAYER_OFFSETS[GameState.PLAYER_VEL_X]
+    INPUT_OFFSET = PLAYER_OFFSETS[GameState.PLAYER_INPUT_X]
+    ACTION_OFFSET = PLAYER_OFFSETS[GameState.PLAYER_ACTION]
+    ACTION_TIME_OFFSET = PLAYER_OFFSETS[GameState.PLAYER_ACTION_TIME]
+
+    def __init__(self, registry):
+        self.field_names = []  # snapshot order, matches the historical pandas column order
+        self.kinds = {}
+        self.slots = {}
+        self.slot_names = []
+        self.slot_kinds = []
+        self.slot_enums = []
+
+        self.AddField(GameState.ARENA_MIN_X, FieldKind.FLOAT)
+        self.AddField(GameState.ARENA_MAX_X, FieldKind.FLOAT)
+        self.AddField(GameState.ARENA_MIN_Z, FieldKind.FLOAT)
+        self.AddField(GameState.ARENA_MAX_Z, FieldKind.FLOAT)
+        self.AddField(GameState.CONTROL_TEAM, FieldKind.INT)
+        self.AddField(GameState.CONTROL_INDEX, FieldKind.INT)
+        for prefix in GameState.TEAMSIDE_PREFIXES:
+            self.AddField(prefix + GameState.TEAM_NET_X, FieldKind.FLOAT)
+            self.AddField(prefix + GameState.TEAM_NET_Z, FieldKind.FLOAT)
+            self.AddField(prefix + GameState.TEAM_ATTACK_Z, FieldKind.FLOAT)
+            self.AddField(prefix + GameState.TEAM_SCORE, FieldKind.INT)
+            self.AddField(prefix + GameState.TEAM_PLAYERS, FieldKind.INT)
+
+        self.player_base_slot = len(self.slot_names)
+        self.num_players = len(registry.players)
+        for entry in registry.entry_list:
+            self.AddField(entry.GetFieldName(GameState.PLAYER_NAME), FieldKind.TEXT)
+            for field in self.PLAYER_BLOCK:
+                if field == GameState.PLAYER_ACTION:
+                    self.AddField(entry.GetFieldName(field), FieldKind.ENUM, Action.ACTION_LIST)
+                elif field in (GameState.PLAYER_IS_HUMAN, GameState.PLAYER_ACTION_TIME):
+                    self.AddField(entry.GetFieldName(field), FieldKind.INT)
+                else:
+                    self.AddField(entry.GetFieldName(field), FieldKind.FLOAT)
+
+        self.AddField(GameState.PREVIOUS_PHASE, FieldKind.ENUM, GamePhase.PHASE_LIST)
+        self.AddField(GameState.CURRENT_PHASE, FieldKind.ENUM, GamePhase.PHASE_LIST)
+
+        self.num_slots = len(self.slot_names)
+        # which GameState revision counter a write to each slot bumps
+        self.slot_revisions = [None] * self.num_slots
+        for slot in (self.slots[GameState.CONTROL_TEAM], self.slots[GameState.CONTROL_INDEX]):
+            self.slot_revisions[slot] = 'control_revision'
+        for entry in registry.entry_list:
+            base = self.PlayerBaseSlot(entry.global_index)
+            self.slot_revisions[base + self.POS_OFFSET] = 'position_revision'
+            self.slot_revisions[base + self.POS_OFFSET + 1] = 'position_revision'
+            self.slot_revisions[base + self.ACTION_TIME_OFFSET] = 'action_time_revision'
+        self.slot_encoders = [None if enum is None else {v: i for i, v in enumerate(enum)}
+                              for enum in self.slot_enums]
+
+        # named record view of the state vector, every field is a float64
+        self.dtype = numpy.dtype([(name, numpy.float64) for name in self.slot_names])
+
+    def AddField(self, field, kind, enum=None):
+        self.field_names.append(field)
+        self.kinds[field] = kind
+        if kind != FieldKind.TEXT:
+            self.slots[field] = len(self.slot_names)
+            self.slot_names.append(field)
+            self.slot_kinds.append(kind)
+            self.slot_enums.append(enum)
+
+    def PlayerBaseSlot(self, global_index):
+        return self.player_base_slot + global_index * self.PLAYER_STRIDE
+
+    def PlayerSlot(self, global_index, field):
+        return self.PlayerBaseSlot(global_index) + self.PLAYER_OFFSETS[field]
+
+    def PlayerBlock(self, values):
+        """(players, PLAYER_STRIDE) view of the player fields of a state vector."""
+        end = self.player_base_slot + self.num_players * self.PLAYER_STRIDE
+        return values[..., self.player_base_slot:end].reshape(
+            values.shape[:-1] + (self.num_players, self.PLAYER_STRIDE))
+
+    def Records(self, values):
+        """Structured array view of state vectors, fields addressable by name."""
+        return numpy.ascontiguousarray(values).view(self.dtype)
+
+    def EncodeSlot(self, slot, value):
+        encoder = self.slot_encoders[slot]
+        if encoder is None:
+            return value
+        return encoder[value]
+
+    def DecodeSlot(self, slot, raw):
+        kind = self.slot_kinds[slot]
+        if kind == FieldKind.FLOAT:
+            return raw
+        if kind == FieldKind.INT:
+            return int(raw)
+        return self.slot_enums[slot][int(raw)]
+
+    def Decode(self, values, text):
+        snapshot = {}
+        for field in self.field_names:
+            slot = self.slots.get(field)
+            if slot is None:
+                snapshot[field] = text[field]
+            else:
+                snapshot[field] = self.DecodeSlot(slot, values[slot])
+        return snapshot
+
+    def Encode(self, snapshot, values):
+        """Inverse of Decode, writes the numeric fields into values and returns the text."""
+        text = {}
+        for field in self.field_names:
+            slot = self.slots.get(field)
+            if slot is None:
+                text[field] = snapshot[field]
+            else:
+                values[slot] = self.EncodeSlot(slot, snapshot[field])
+        return text
+
+
+class GameStateFrame:
+    """
+    Read-only state of one tick. Supports the item and attribute access the old per-tick
+    pandas.Series offered, e.g. frame['home0_pos_x'] or frame.current_phase.
+    """
+
+    def __init__(self, layout, values, text):
+        self.layout = layout
+        self.values = values
+        self.text = text
+
+    def __getitem__(self, field):
+        slot = self.layout.slots.get(field)
+        if slot is None:
+            return self.text[field]
+        return self.layout.DecodeSlot(slot, self.values[slot])
+
+    def __getattr__(self, field):
+        # only reached for names that are not regular attributes
+        layout = self.__dict__.get('layout')
+        if layout is None or field not in layout.kinds:
+            raise AttributeError(field)
+        return self[field]
+
+    def __contains__(self, field):
+        return field in self.layout.kinds
+
+    def keys(self):
+        return self.layout.field_names
+
+    @property
+    def index(self):
+        return self.layout.field_names
+
+    def GetSnapshot(self):
+        return self.layout.Decode(self.values, self.text)
+
+    def ToSeries(self):
+        # pandas is optional, it is only loaded for this view
+        from sts2.game import pandas_adapter
+        return pandas_adapter.FrameToSeries(self)
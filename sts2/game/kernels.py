@@ -0,0 +1,253 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+Array versions of the per-player game logic.
+Every kernel accepts arbitrary leading batch dimensions, so the same code serves one game
+(players, 2) and many games in lockstep (games, players, 2).
+Vectors are stored as [..., 2] arrays of (x, z) like everywhere else in the game.
+"""
+
+import numpy
+
+from sts2.game.rules import Rules
+from sts2.game.settings import TeamSide
+
+
+def Norm(v):
+    return numpy.sqrt(v[..., 0] * v[..., 0] + v[..., 1] * v[..., 1])
+
+
+def DotNorm(v):
+    """
+    Norm rounded exactly like numpy.linalg.norm of a single vector, for array code that has to
+    reproduce the decisions of the per-player code bit for bit. Slower than Norm.
+    """
+    return numpy.sqrt(numpy.matmul(v[..., None, :], v[..., :, None])[..., 0, 0])
+
+
+def Dot(a, b):
+    return a[..., 0] * b[..., 0] + a[..., 1] * b[..., 1]
+
+
+def RunMotionModelKernel(rules, position, velocity, input, action_time):
+    """ Array version of Player.RunMotionModel, returns the new (position, velocity). """
+    accel_mag = Norm(input)
+    input = input / numpy.where(accel_mag > 1.0, accel_mag, 1.0)[..., None]
+
+    if rules.motion_model == Rules.MotionModel.ACCELERATION_MODEL:
+        # scale desired acc by distance between normalized velocity and normalized acceleration
+        norm_vel = velocity / rules.max_vel
+        input = numpy.where((action_time != 0)[..., None], 0.0, input)
+        actual_accel = input * (Norm(input) - Dot(norm_vel, input))[..., None] * rules.max_accel
+        velocity = velocity + actual_accel
+    elif rules.motion_model == Rules.MotionModel.PAC_MAN_MODEL:
+        velocity = input
+
+    vel_mag = Norm(velocity)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        limited = velocity * rules.max_vel / vel_mag[..., None]
+    velocity = numpy.where((vel_mag > rules.max_vel)[..., None], limited, velocity)
+
+    return position + velocity, velocity
+
+
+def CrossoverConstraintKernel(arena, position, team_side, team_index):
+    """ Array version of the CROSSOVER_CONSTRAINT in Game.LocomotionUpdate. """
+    x1 = numpy.where(team_index % 2 == 1, 1.0 - 0.2, 0.2)
+    x2 = numpy.where(team_index % 2 == 1, 1.0 - 0.6, 0.6)
+    y1 = 0.0
+    y2 = 1.0
+
+    normalized = arena.GetNormalizedCoord(position)
+    away = team_side == TeamSide.AWAY
+    x = numpy.where(away, 1.0 - normalized[..., 0], normalized[..., 0])
+    y = numpy.where(away, 1.0 - normalized[..., 1], normalized[..., 1])
+
+    x_prime = x1 + (x2 - x1) * y / (y2 - y1)
+
+    x_prime = numpy.where(away, 1.0 - x_prime, x_prime)
+    y = numpy.where(away, 1.0 - y, y)
+
+    return arena.GetArenaCoordFromNormalized(numpy.stack([x_prime, y], axis=-1))
+
+
+def BoardCollisionKernel(arena, radius, position, velocity):
+    """ Array version of Physics.BoardCollisionUpdate, returns the new (position, velocity). """
+    mins = arena.mins + radius
+    maxs = arena.maxs - radius
+    hit = (position < mins) | (position > maxs)
+    return numpy.clip(position, mins, maxs), numpy.where(hit, 0.0, velocity)
+
+
+def OnNetChanceKernel(rules, position, attacking_net_position):
+    """ Array version of Game.ComputeOnNetChance. """
+    net_delta = attacking_net_position - position
+    net_dir_z = net_delta[..., 1] / Norm(net_delta)
+    shot_directness_chance = numpy.abs(net_dir_z)
+    shot_distance_chance = numpy.minimum(1.0, rules.shot_distance_accuracy_scale / numpy.abs(
+        net_delta[..., 1]))
+    return shot_directness_chance * shot_distance_chance
+
+
+def InterceptKernel(rules, source, target, defenders, capable, draws=None):
+    """
+    Array version of Physics.InterceptTest.
+    source and target are [..., 2] trajectories, defenders is [..., D, 2] and capable a [..., D]
+    mask of the defenders allowed to intercept. Returns the through chance per trajectory and,
+    when uniform draws of shape [..., D] are given, the index of the sampled interceptor (-1 when
+    the trajectory is not intercepted). Like the scalar test the interception goes to the
+    successful defender with the shortest closest distance, ties to the lowest index.
+    """
+    traj_delta = target - source
+    traj_distance = Norm(traj_delta) + 1e-10
+    traj_dir = traj_delta / traj_distance[..., None]
+
+    # project players onto trajectory to find unconstrained intercept points
+    player_source_delta = defenders - source[..., None, :]
+    intercept_source_dist = Dot(traj_dir[..., None, :], player_source_delta)
+    # if behind the trajectory there is no intercept
+    eligible = capable & (intercept_source_dist > 0.0)
+
+    # adjust intercept point if source or target is closer
+    past_target = intercept_source_dist > traj_distance[..., None]
+    intercept = numpy.where(past_target[..., None], target[..., None, :],
+                            source[..., None, :] + traj_dir[..., None, :] * intercept_source_dist[
+                                ..., None])
+    intercept_source_dist = numpy.where(past_target, traj_distance[..., None],
+                                        intercept_source_dist)
+
+    player_intercept_dist = Norm(defenders - intercept)
+    closest_dist = numpy.maximum(0.0,
+                                 player_intercept_dist - rules.player_intercept_speed * intercept_source_dist)
+    prob = (rules.max_intercept_chance - rules.min_intercept_chance) \
+           * closest_dist / rules.max_intercept_dist + rules.min_intercept_chance
+    prob = numpy.where(eligible & (closest_dist <= rules.max_intercept_dist), prob, 0.0)
+
+    through_chance = numpy.prod(1.0 - prob, axis=-1)
+    if draws is None:
+        return through_chance, None
+
+    if prob.shape[-1] == 0:
+        return through_chance, numpy.full(through_chance.shape, -1)
+    intercepted = eligible & (draws < prob) & (closest_dist < (traj_distance + 1.0)[..., None])
+    interceptor = numpy.argmin(numpy.where(intercepted, closest_dist, numpy.inf), axis=-1)
+    interceptor = numpy.where(intercepted.any(axis=-1), interceptor, -1)
+    return through_chance, interceptor
+
+
+def ContactMatrixKernel(radius, position):
+    """ [..., P, P] mask of touching pairs (i, j) with i < j. """
+    delta = position[..., :, None, :] - position[..., None, :, :]
+    touching = Norm(delta) <= radius * 2
+    return touching & numpy.triu(numpy.ones(touching.shape[-2:], dtype=bool), 1)
+
+
+def SweepPairsKernel(radius, position):
+    """
+    Sort-and-sweep broadphase over a flat [players, 2] array. Players are sorted along x and each
+    is only tested against the following players whose x is within the contact distance, so
+    every unordered pair is considered once. Returns the touching pairs as (first, second) index
+    arrays with first < second, ordered by first then second.
+    """
+    contact_dist = radius * 2
+    order = numpy.argsort(position[:, 0], kind='stable')
+    xs = position[order, 0]
+    ends = numpy.searchsorted(xs, xs + contact_dist, side='right')
+    counts = ends - numpy.arange(len(xs)) - 1
+    if counts.sum() == 0:
+        empty = numpy.zeros(0, dtype=int)
+        return empty, empty
+
+    a = numpy.repeat(numpy.arange(len(xs)), counts)
+    b = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts) + a + 1
+    a = order[a]
+    b = order[b]
+    touching = Norm(position[a] - position[b]) <= contact_dist
+    first = numpy.minimum(a, b)[touching]
+    second = numpy.maximum(a, b)[touching]
+    pair_order = numpy.lexsort((second, first))
+    return first[pair_order], second[pair_order]
+
+
+def ResolveContactsKernel(radius, position, velocity, first, second):
+    """
+    Pushes every touching pair apart around its center and gives both the average velocity.
+    position and velocity are flat [players, 2] arrays and first/second index the pairs, so
+    batched callers flatten their (game, player) axes first. A player touching several others
+    ends up at the mean of its resolved positions, which keeps the result independent of the
+    order the pairs are visited in. Returns the new (position, velocity).
+    """
+    if len(first) == 0:
+        return position, velocity
+
+    center = (position[first] + position[second]) * 0.5
+    avg_vel = (velocity[first] + velocity[second]) * 0.5
+
+    position_sum = numpy.zeros_like(position)
+    velocity_sum = numpy.zeros_like(velocity)
+    count = numpy.zeros(len(position))
+    for index in (first, second):
+        delta = position[index] - center
+        dist = Norm(delta)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            direction = delta / dist[..., None]
+        direction = numpy.where((dist > 0.001)[..., None], direction, numpy.array([1.0, 0.0]))
+        numpy.add.at(position_sum, index, center + direction * radius * 1.01)
+        numpy.add.at(velocity_sum, index, avg_vel)
+        numpy.add.at(count, index, 1.0)
+
+    touched = count > 0
+    position = position.copy()
+    velocity = velocity.copy()
+    position[touched] = position_sum[touched] / count[touched, None]
+    velocity[touched] = velocity_sum[touched] / count[touched, None]
+    return position, velocity
+
+
+def RectifyInputKernel(input):
+    """ Array version of Player.RectifyInput. """
+    input_mag = DotNorm(input)
+    moving = input_mag > 0.01
+    input = numpy.where(moving[..., None], input / numpy.where(moving, input_mag, 1.0)[..., None],
+                        input)
+    # force onto [-1,0,1] for each dimension
+    return numpy.round(input)
+
+
+def SupportInputKernel(position, team_centroid, attacking_net_position, spread):
+    """
+    SimplePlayer input of the controller's teammates: move up the arena, spreading out from the
+    team centroid by spread * 0.5.
+    """
+    center_delta = position - team_centroid
+    center_dir = center_delta / (DotNorm(center_delta) + 1e-10)[..., None]
+    dest = (attacking_net_position + position) * 0.5 + center_dir * spread * 0.5
+    return dest - position
+
+
+def ChaseInputKernel(position, rank, control_position, control_net_position, chase_ranks):
+    """
+    SimplePlayer input of the controller's opponents: the ones ranked closer than chase_ranks
+    chase the controller, the rest cut off its path to the net.
+    """
+    target_pos = numpy.where((rank < chase_ranks)[..., None], control_position,
+                             (control_position + control_net_position) * 0.5)
+    return target_pos - position
+
+
+def PassChoiceKernel(net_dist, teammate_net_dist, pass_chance, can_receive, min_pass_chance):
+    """
+    SimplePlayer's pass choice without random passes. Walks the [..., slots] teammates in order
+    and passes to every one that can receive, is closer to the net than the best so far and
+    whose pass chance beats min_pass_chance. Returns the [..., slots] mask of those passes, the
+    last one is the pass taken.
+    """
+    passes = numpy.zeros(teammate_net_dist.shape, dtype=bool)
+    lowest_net_dist = net_dist
+    for slot in range(teammate_net_dist.shape[-1]):
+        passes[..., slot] = can_receive[..., slot] & (
+                teammate_net_dist[..., slot] < lowest_net_dist) & (
+                                    pass_chance[..., slot] > min_pass_chance)
+        lowest_net_dist = numpy.where(passes[..., slot], teammate_net_dist[..., slot],
+                                      lowest_net_dist)
+    return passes
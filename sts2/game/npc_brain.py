@@ -0,0 +1,142 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+Team level SimplePlayer decisions.
+NPCBrain runs Player.Think for every SimplePlayer of a game with array operations: the
+response time bookkeeping, the support and chase targets of the players without the puck
+and the input rectification are done for a run of them at once, the puck carrier's shot and
+pass choice reads the cached shot and pass evaluation. The tuning constants (SHOT_CHANCE,
+RANDOM_SKATE_CHANCE, ...) are read off every player, so subclasses and instances may tune them.
+The result is the same as thinking player by player, random draws included: the NPCs are
+batched in the runs between the other players and the puck carrier, so draws are taken in
+player order and every player sees exactly the state it would have seen in the per-player
+loop. The array logic is shared with BatchGame through sts2.game.kernels.
+"""
+
+import numpy
+
+from sts2.game import kernels
+from sts2.game.game_state import Action
+from sts2.game.player import Player, SimplePlayer
+
+NONE = Action.ACTION_LIST.index(Action.NONE)
+STUNNED = Action.ACTION_LIST.index(Action.STUNNED)
+SHOOT = Action.ACTION_LIST.index(Action.SHOOT)
+PASSES = [Action.ACTION_LIST.index(action) for action in Action.PASSES]
+CHASE_RANKS = 2  # the opponents this close to the controller chase it, M in SimplePlayer
+# below this many NPCs the fixed cost of the array operations eats the gain: per tick the brain
+# and the per-player loop are even up to 6v6 and the brain wins from 8v8 up (630 vs 785 us)
+MIN_NPCS = 16
+
+
+def IsNPC(player):
+    # players whose whole Think is SimplePlayer's, agents override custom_think
+    cls = type(player)
+    return (isinstance(player, SimplePlayer) and cls.custom_think is SimplePlayer.custom_think
+            and cls.Think is Player.Think and cls.RectifyInput is Player.RectifyInput)
+
+
+class NPCBrain:
+    """ Per roster constants, shared by a game and its forks. """
+
+    def __init__(self, game):
+        self.npc = numpy.array([IsNPC(player) for player in game.players], dtype=bool)
+        self.npc_indices = numpy.flatnonzero(self.npc)
+        self.others = numpy.flatnonzero(~self.npc).tolist()
+        self.team_sides = game.player_team_sides
+        self.arena_diagonal = numpy.linalg.norm(numpy.array(game.arena.arena_size))
+        self.support_spread = game.arena.arena_size[0]
+
+    def Think(self, game, verbosity):
+        """ Player.Think of every player, in game.players order. """
+        c = game.registry.GetGlobalIndex(game.control.GetControl())
+        # other players and the puck carrier may draw from game.rng or read the actions set
+        # before them, so the NPCs are batched in the runs between them, in roster order
+        stops = self.others if not self.npc[c] else sorted(self.others + [c])
+        begin = 0
+        for i in stops:
+            self.ThinkRun(game, begin, i, c)
+            if not self.npc[i]:
+                game.players[i].Think(game, verbosity)
+            else:
+                if len(self.Prologue(game, numpy.array([c]))):
+                    self.ControllerThink(game, c)
+                self.RectifyInputs(game, numpy.array([c]))
+            begin = i + 1
+        self.ThinkRun(game, begin, len(game.players), c)
+
+    def ThinkRun(self, game, begin, end, c):
+        """ Player.Think of the NPCs without the puck in [begin, end), c the controller index. """
+        if begin == end:
+            return
+        indices = numpy.arange(begin, end)
+        free = self.Prologue(game, indices)
+        if len(free):
+            self.FollowerThink(game, free, game.rng.random(len(free)), c)
+        self.RectifyInputs(game, indices)
+
+    def Prologue(self, game, indices):
+        """ The start of Player.Think for NPCs, returns the ones free to act. """
+        state = game.state
+        action_times = numpy.maximum(0, state.action_times[indices] - 1)
+        state.action_times[indices] = action_times
+        state.actions[indices] = numpy.where(action_times > 0, STUNNED, NONE)
+        state.inputs[indices] = 0.0
+        state.MarkActionTimesChanged()
+        return indices[action_times == 0]
+
+    def FollowerThink(self, game, indices, draws, c):
+        """ SimplePlayer.custom_think of NPCs without the puck, c the controller index. """
+        state = game.state
+        position = state.positions[indices]
+        control_position = state.positions[c]
+        support_input = kernels.SupportInputKernel(
+            position, game.derived.GetTeamCentroids()[self.team_sides[indices]],
+            game.attacking_net_positions[indices], self.support_spread)
+        chase_input = kernels.ChaseInputKernel(
+            position, game.derived.GetDistanceRankArray()[indices], control_position,
+            game.attacking_net_positions[c], CHASE_RANKS)
+
+        input = numpy.where((self.team_sides[indices] == self.team_sides[c])[:, None],
+                            support_input, chase_input)
+        skate_chance = numpy.array([game.players[i].RANDOM_SKATE_CHANCE for i in indices])
+        state.inputs[indices] = numpy.where((draws < skate_chance)[:, None], 0.0, input)
+
+    def ControllerThink(self, game, c):
+        """ SimplePlayer.custom_think of the puck carrier, head for the net, shoot or pass. """
+        state = game.state
+        rng = game.rng
+        player = game.players[c]
+        position = state.positions[c].copy()
+        net_pos = game.attacking_net_positions[c]
+        net_delta = net_pos - position
+        state.inputs[c] = net_delta
+        shots, passes = game.GetShotPassEvaluation()
+
+        net_dist = kernels.DotNorm(net_delta)
+        shoot = player.RANDOM_SHOT_CHANCE == 0.0 and net_dist < player.SHOOT_ARENA_DIST * \
+                self.arena_diagonal and shots[c] > player.SHOT_CHANCE
+        shoot = shoot or rng.random() < player.RANDOM_SHOT_CHANCE
+        if shoot:
+            state.actions[c] = SHOOT
+            return
+
+        teammates = game.registry.team_indices[self.team_sides[c]][:len(PASSES)]
+        can_receive = (teammates != c) & (state.actions[teammates] != STUNNED)
+        if player.RANDOM_PASS_CHANCE == 0.0:
+            passing = kernels.PassChoiceKernel(
+                net_dist, kernels.DotNorm(state.positions[teammates] - net_pos),
+                passes[c, teammates], can_receive, player.PASS_CHANCE)
+            # the per-player code draws once for every candidate it does not pass to
+            rng.random(numpy.count_nonzero(can_receive & ~passing))
+        else:
+            passing = numpy.zeros(len(teammates), dtype=bool)
+            passing[can_receive] = rng.random(numpy.count_nonzero(can_receive)) < \
+                                   player.RANDOM_PASS_CHANCE
+        slots = numpy.flatnonzero(passing)
+        if len(slots):
+            state.actions[c] = PASSES[slots[-1]]
+
+    def RectifyInputs(self, game, indices):
+        """ Player.RectifyInput of the NPCs at indices. """
+        game.state.inputs[indices] = kernels.RectifyInputKernel(game.state.inputs[indices])
@@ -0,0 +1,31 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+pandas views of game data. The engine itself only needs NumPy; this module is imported the
+first time one of the views below is asked for, so headless workers never load pandas.
+"""
+
+import pandas
+
+from sts2.game.simulation import EVENT_COLUMNS, EventHistoriesToColumns
+
+
+def FrameToSeries(frame):
+    """ Series of a GameStateFrame indexed by field name, like the old per tick state. """
+    return pandas.Series(frame.GetSnapshot())
+
+
+def EventHistoryToDataFrame(history, l=None):
+    if l is not None:
+        return pandas.DataFrame(history.ToColumns(l), columns=EVENT_COLUMNS)
+    columns = history.ToColumns()
+    # the stored codes become the categorical codes directly
+    columns['event_type'] = pandas.Categorical.from_codes(history.type_codes,
+                                                          categories=history.event_types)
+    return pandas.DataFrame(columns, columns=EVENT_COLUMNS)
+
+
+def EventHistoriesToDataFrame(histories, episodes=None):
+    columns = EventHistoriesToColumns(histories, episodes)
+    columns['event_type'] = pandas.Categorical(columns['event_type'])
+    return pandas.DataFrame(columns)
@@ -20,6 +20,10 @@ class Player(object):
     def IsHuman(self):
         return False
 
+    def IsAgent(self):
+        # controlled from outside through the client adapter
+        return False
+
     def ClearMotion(self, game):
         self.SetPosition(game, numpy.zeros(2))
         self.SetVelocity(game, numpy.zeros(2))
@@ -131,7 +135,7 @@ class Player(object):
         return game.control.GetControl() is self
 
     def GetTeamIndex(self, game):
-        return game.team_players[self.team_side].index(self)
+        return game.registry.GetTeamIndex(self)
 
     def Stun(self, game, t):
         if t > 0:
@@ -197,10 +201,7 @@ class SimplePlayer(Player):
         control_player = game.control.GetControl()
         net_pos = self.GetAttackingNetPos(game)
 
-        avg_teammate_pos = numpy.zeros(2)
-        for teammate in game.team_players[self.team_side]:
-            avg_teammate_pos += teammate.GetPosition(game)
-        avg_teammate_pos /= len(game.team_players[self.team_side])
+        avg_teammate_pos = game.derived.GetTeamCentroids()[self.team_side]
         center_delta = self.GetPosition(game) - avg_teammate_pos
         # IB: avoid division by zero:
         norm = numpy.linalg.norm(center_delta)
@@ -214,24 +215,23 @@ class SimplePlayer(Player):
 
             shoot_dist = self.SHOOT_ARENA_DIST * numpy.linalg.norm(
                 numpy.array(game.arena.arena_size))
-            shot_chance = game.PlayerShot(self, True, 0)
+            shot_chance = game.EvaluateShots([self])[0]
             # shoot if close
             shoot = self.RANDOM_SHOT_CHANCE == 0.0 and net_dist < shoot_dist and shot_chance > self.SHOT_CHANCE
-            shoot = shoot or numpy.random.random() < self.RANDOM_SHOT_CHANCE
+            shoot = shoot or game.rng.random() < self.RANDOM_SHOT_CHANCE
             if shoot:
                 if verbosity:   print('shooting because %f < %f' % (net_dist, shoot_dist))
                 self.SetAction(game, Action.SHOOT)
             else:
                 lowest_net_dist = numpy.linalg.norm(self.GetPosition(game) - net_pos)
-                for teammate, action in zip(game.team_players[self.team_side], Action.PASSES):
-                    if teammate is self:
-                        continue
-                    if teammate.GetAction(game) == Action.STUNNED:
-                        continue
+                candidates = [(teammate, action) for teammate, action in
+                              zip(game.team_players[self.team_side], Action.PASSES) if
+                              teammate is not self and teammate.GetAction(game) != Action.STUNNED]
+                pass_chances = game.EvaluatePasses(self, [teammate for teammate, _ in candidates])
+                for (teammate, action), pass_chance in zip(candidates, pass_chances):
                     net_dist = numpy.linalg.norm(teammate.GetPosition(game) - net_pos)
-                    pass_chance = game.PlayerPass(self, teammate, True, 0)
                     should_pass = self.RANDOM_PASS_CHANCE == 0.0 and net_dist < lowest_net_dist and pass_chance > self.PASS_CHANCE
-                    should_pass = should_pass or numpy.random.random() < self.RANDOM_PASS_CHANCE
+                    should_pass = should_pass or game.rng.random() < self.RANDOM_PASS_CHANCE
                     if should_pass:
                         self.SetAction(game, action)
                         lowest_net_dist = net_dist
@@ -241,7 +241,7 @@ class SimplePlayer(Player):
                 if verbosity: print('move towards net')
 
         elif control_player:
-            if numpy.random.random() < self.RANDOM_SKATE_CHANCE:
+            if game.rng.random() < self.RANDOM_SKATE_CHANCE:
                 self.SetInput(game, numpy.zeros(2))
             elif control_player.team_side == self.team_side:
                 if verbosity: print('move up areana')
@@ -0,0 +1,60 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import numpy
+
+from sts2.game.settings import TeamSide
+
+
+class PlayerEntry:
+    def __init__(self, player, global_index, team_index):
+        self.player = player
+        self.global_index = global_index  # index into game.players
+        self.team_index = team_index  # index into game.team_players[player.team_side]
+        self.prefix = TeamSide.GetName(player.team_side) + str(team_index)
+        self.field_names = {}
+
+    def GetFieldName(self, field):
+        field_name = self.field_names.get(field)
+        if field_name is None:
+            field_name = self.prefix + field
+            self.field_names[field] = field_name
+        return field_name
+
+
+class PlayerRegistry:
+    """
+    Stable indices for every player of a game, assigned once when the game is built.
+    Players are looked up by identity so accessors never scan the team lists.
+    """
+
+    def __init__(self, players, team_players):
+        self.players = players
+        self.team_players = team_players
+        self.entries = {}
+        for team_side in TeamSide.TEAMSIDES:
+            for team_index, player in enumerate(team_players[team_side]):
+                self.entries[player] = PlayerEntry(player, players.index(player), team_index)
+        # entries in game.players order
+        self.entry_list = [self.entries[player] for player in players]
+        # global indices of each team in team order, for indexing per player arrays
+        self.team_indices = [numpy.array([self.entries[player].global_index for player in
+                                          team_players[team_side]], dtype=int)
+                             for team_side in TeamSide.TEAMSIDES]
+
+    def GetEntry(self, player):
+        return self.entries[player]
+
+    def GetGlobalIndex(self, player):
+        return self.entries[player].global_index
+
+    def GetTeamIndex(self, player):
+        return self.entries[player].team_index
+
+    def GetPrefix(self, player):
+        return self.entries[player].prefix
+
+    def GetFieldName(self, player, field):
+        return self.entries[player].GetFieldName(field)
+
+    def GetPlayer(self, team_side, team_index):
+        return self.team_players[team_side][team_index]
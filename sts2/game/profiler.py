@@ -0,0 +1,123 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+Opt-in per stage tick profiler.
+Game.SetProfiler(TickProfiler()) replaces the stage methods of that game instance, and of its
+physics, with timed wrappers, and SetProfiler(None) removes them again. A game without a
+profiler runs its plain methods, the only cost left is a None check at the few places that
+count things, e.g. collision pairs.
+"""
+
+import json
+import time
+
+import numpy
+
+NUM_BUCKETS = 64  # log2 nanosecond histogram buckets, bucket i holds durations < 2**i ns
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.total = 0  # ns
+        self.max = 0
+        self.histogram = numpy.zeros(NUM_BUCKETS, dtype=numpy.int64)
+
+    def Add(self, duration):
+        self.calls += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.histogram[duration.bit_length()] += 1
+
+    def GetStats(self):
+        buckets = numpy.flatnonzero(self.histogram)
+        return {
+            'calls': self.calls,
+            'total_ms': self.total * 1e-6,
+            'mean_us': self.total * 1e-3 / max(1, self.calls),
+            'max_us': self.max * 1e-3,
+            # [upper bound in us, calls] of the non empty buckets
+            'histogram': [[2 ** int(i) * 1e-3, int(self.histogram[i])] for i in buckets],
+        }
+
+
+class TickProfiler:
+    # methods wrapped on the game and on game.physics, outermost calls only
+    GAME_STAGES = ['CustomTick', 'PhaseUpdate', 'DrawArena', 'AIUpdate', 'LocomotionUpdate',
+                   'ActionUpdate', 'RulesUpdate', 'OnPlayStart', 'PlayerShot', 'PlayerPass',
+                   'GetShotPassEvaluation']
+    PHYSICS_STAGES = ['Update', 'BoardCollisionUpdate', 'PlayerCollisionUpdate',
+                      'InterceptTest', 'InterceptChances']
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.active = set()  # stages being timed, so recursive calls are not counted twice
+
+    def Attach(self, game):
+        for name in self.GAME_STAGES:
+            self.Wrap(game, 'Game.' + name, name)
+        for name in self.PHYSICS_STAGES:
+            self.Wrap(game.physics, 'Physics.' + name, name)
+
+    def Detach(self, game):
+        for name in self.GAME_STAGES:
+            game.__dict__.pop(name, None)
+        for name in self.PHYSICS_STAGES:
+            game.physics.__dict__.pop(name, None)
+
+    def Wrap(self, obj, stage, name):
+        method = getattr(type(obj), name).__get__(obj)
+
+        def Timed(*args, **kwargs):
+            return self.Call(stage, method, *args, **kwargs)
+
+        setattr(obj, name, Timed)
+
+    def Call(self, stage, function, *args, **kwargs):
+        """ Calls function and adds its wall time to stage. """
+        if stage in self.active:
+            return function(*args, **kwargs)
+        self.active.add(stage)
+        start = time.perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.active.discard(stage)
+            self.Record(stage, start, time.perf_counter_ns() - start)
+
+    def Record(self, stage, start, duration):
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+        stats.Add(duration)
+
+    def Count(self, counter, n=1):
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def Reset(self):
+        self.stages = {}
+        self.counters = {}
+
+    def GetStats(self):
+        return {'stages': {stage: stats.GetStats() for stage, stats in self.stages.items()},
+                'counters': dict(self.counters)}
+
+    def Dump(self, path):
+        """ Writes GetStats as JSON. """
+        with open(path, 'w') as f:
+            json.dump(self.GetStats(), f, indent=2)
+
+    def Report(self):
+        """ Table of the stages by total time, the share is of Game.CustomTick. """
+        tick = self.stages.get('Game.CustomTick')
+        lines = ['%-30s %8s %10s %10s %10s %6s' % ('stage', 'calls', 'total ms', 'mean us',
+                                                   'max us', 'tick%')]
+        for stage, stats in sorted(self.stages.items(), key=lambda item: -item[1].total):
+            lines.append('%-30s %8d %10.1f %10.1f %10.1f %6.1f' % (
+                stage, stats.calls, stats.total * 1e-6, stats.total * 1e-3 / max(1, stats.calls),
+                stats.max * 1e-3, 100.0 * stats.total / tick.total if tick else 0.0))
+        for counter, n in sorted(self.counters.items()):
+            lines.append('%-30s %8d' % (counter, n))
+        return '\n'.join(lines)
@@ -287,7 +287,7 @@ class PygameInterface:
             self.replay_frame = numpy.clip(self.replay_frame, 0,
                                            len(self.game.game_state_history) - 1)
 
-            return self.game.game_state_history[self.replay_frame].state
+            return self.game.game_state_history.GetFrame(self.replay_frame)
 
         # we are in live game
         if self.game.IsSimulationComplete():
@@ -296,7 +296,10 @@ class PygameInterface:
         if self.AllowSimulation():
             self.game.update()
 
-        return self.game.game_state_history[-1].state
+        if len(self.game.game_state_history) == 0:
+            # history is off
+            return self.game.state.GetFrame()
+        return self.game.game_state_history.GetFrame(-1)
 
     def ProcessReplayInputs(self):
         wants_quit = False
@@ -0,0 +1,169 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+Columnar episode recording.
+Every recorded tick is one row of fixed-width NumPy columns: the state vector, and per player the
+action index, policy vector, value estimate and reward. Rows are appended into buffers that
+double in size when full, and a recording is saved as one .npz file or as a directory of .npy
+files that can be memory mapped when read back.
+"""
+
+import json
+import os
+
+import numpy
+
+from sts2.game.game_state import GameStateFrame
+from sts2.game.settings import Outputs
+from sts2.game.simulation import GameHistoryEntry, HistoryPolicy
+
+COLUMNS = ['tick', 'state', 'action', 'policy', 'value', 'reward']
+NO_ACTION = -1  # action column value of a player that made no decision
+
+
+class EpisodeRecording:
+    """
+    Read access to recorded ticks. Rows are addressed like a list, negative indices included,
+    and recording[i] returns a GameHistoryEntry like the old per-tick history list did.
+    """
+
+    def __init__(self, layout, text, player_identity_list, columns, size):
+        self.layout = layout
+        self.text = text
+        self.player_identity_list = player_identity_list
+        self.columns = columns
+        self.size = size
+        self.start = 0  # buffer row of the oldest recorded tick, moves when used as a ring
+
+    def __len__(self):
+        return self.size
+
+    def GetRow(self, i):
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        return (self.start + i) % len(self.columns['tick'])
+
+    def GetColumn(self, name):
+        """ Recorded rows of one column, oldest first, a view valid until the next append. """
+        column = self.columns[name]
+        if self.start + self.size <= len(column):
+            return column[self.start:self.start + self.size]
+        return numpy.concatenate([column[self.start:], column[:self.start + self.size -
+                                                               len(column)]])
+
+    def GetFrame(self, i):
+        """ GameStateFrame of row i, what PygameInterface replays. """
+        return GameStateFrame(self.layout, numpy.array(self.columns['state'][self.GetRow(i)]),
+                              self.text)
+
+    def __getitem__(self, i):
+        i = self.GetRow(i)
+        actions = [None if action == NO_ACTION else int(action) for action in
+                   self.columns['action'][i]]
+        policies = [None if numpy.isnan(policy[0]) else policy for policy in
+                    self.columns['policy'][i]]
+        return GameHistoryEntry(int(self.columns['tick'][i]), self.GetFrame(i),
+                                self.player_identity_list, policies, actions,
+                                self.columns['value'][i].tolist(),
+                                self.columns['reward'][i].tolist())
+
+    def Save(self, path):
+        """
+        Writes the recorded rows to path. A path ending in .npz gets a single uncompressed
+        archive, any other path becomes a directory with one .npy file per column.
+        """
+        meta = json.dumps({'slot_names': self.layout.slot_names, 'text': self.text,
+                           'player_identity_list': self.player_identity_list})
+        if path.endswith('.npz'):
+            numpy.savez(path, meta=numpy.array(meta),
+                        **{name: self.GetColumn(name) for name in COLUMNS})
+            return
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            f.write(meta)
+        for name in COLUMNS:
+            numpy.save(os.path.join(path, name + '.npy'), self.GetColumn(name))
+
+    @staticmethod
+    def Load(path, layout, mmap=True):
+        """
+        Reads a recording written by Save. layout must be the GameStateLayout of a game with the
+        same rosters, columns of a directory recording are memory mapped unless mmap is False.
+        """
+        if path.endswith('.npz'):
+            with numpy.load(path) as data:
+                meta = json.loads(str(data['meta']))
+                columns = {name: data[name] for name in COLUMNS}
+        else:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            columns = {name: numpy.load(os.path.join(path, name + '.npy'),
+                                        mmap_mode='r' if mmap else None) for name in COLUMNS}
+        assert meta['slot_names'] == layout.slot_names, 'recording is for a different layout'
+        return EpisodeRecording(layout, meta['text'], meta['player_identity_list'], columns,
+                                len(columns['tick']))
+
+
+class EpisodeRecorder(EpisodeRecording):
+    """
+    Append-only recording of a running game. With a bounded HistoryPolicy the buffers grow to
+    max_ticks rows and are then used as a ring, or saved to the spill directory and emptied.
+    """
+
+    def __init__(self, game, capacity=1024):
+        super(EpisodeRecorder, self).__init__(game.state.layout, game.state.text,
+                                              game.player_identity_list, {}, 0)
+        self.game = game
+        self.policy = game.history_policy
+        if self.policy.max_ticks is not None:
+            capacity = min(capacity, self.policy.max_ticks)
+        num_players = len(game.players)
+        self.columns = {
+            'tick': numpy.zeros(capacity, dtype=numpy.int64),
+            'state': numpy.zeros((capacity, self.layout.num_slots)),
+            'action': numpy.zeros((capacity, num_players), dtype=numpy.int8),
+            'policy': numpy.zeros((capacity, num_players, Outputs.NUM), dtype=numpy.float32),
+            'value': numpy.zeros((capacity, num_players), dtype=numpy.float32),
+            'reward': numpy.zeros((capacity, num_players), dtype=numpy.float32),
+        }
+
+    def Grow(self):
+        capacity = 2 * len(self.columns['tick'])
+        if self.policy.max_ticks is not None:
+            capacity = min(capacity, self.policy.max_ticks)
+        for name, column in self.columns.items():
+            grown = numpy.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def Append(self):
+        """ Records the current tick of the game. """
+        if self.size == len(self.columns['tick']):
+            if self.policy.max_ticks is None or self.size < self.policy.max_ticks:
+                self.Grow()
+            elif self.policy.mode == HistoryPolicy.SPILL:
+                self.Save(self.policy.GetSpillPath('ticks', int(self.GetColumn('tick')[0]), 'npz'))
+                self.Clear()
+            else:
+                # overwrite the oldest row
+                self.start = (self.start + 1) % self.size
+                self.size -= 1
+        game = self.game
+        i = (self.start + self.size) % len(self.columns['tick'])
+        self.columns['tick'][i] = game.tick
+        self.columns['state'][i] = game.state.values
+        # names only change when players are renamed, which replaces the dict
+        self.text = game.state.text
+        for p, (action, policy) in enumerate(zip(game.player_action_list,
+                                                 game.player_policy_list)):
+            self.columns['action'][i, p] = NO_ACTION if action is None else action
+            self.columns['policy'][i, p] = numpy.nan if policy is None else policy
+        self.columns['value'][i] = game.player_value_estimate_list
+        self.columns['reward'][i] = game.player_reward_list
+        self.size += 1
+
+    def Clear(self):
+        self.size = 0
+        self.start = 0
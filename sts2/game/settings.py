@@ -22,6 +22,7 @@ class GamePhase:
     STOPPAGE_GOAL = "STOPPAGE_GOAL"
     STOPPAGE_TIMEUP = "STOPPAGE_TIMEUP"
     GAME_OVER = "GAME_OVER"
+    PHASE_LIST = [PRE_GAME, START_PLAY, GAME_ON, STOPPAGE_GOAL, STOPPAGE_TIMEUP, GAME_OVER]
 
 
 class STS2Event:
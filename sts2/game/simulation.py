@@ -1,6 +1,10 @@
 # Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
 
-import pandas
+import bisect
+import json
+import os
+
+import numpy
 
 
 class GameHistoryEntry:
@@ -27,13 +31,233 @@ class GameEvent:
         self.source_player_name = source_player_name
         self.target_player_name = target_player_name
 
+    def GetTuple(self):
+        return self.tick, self.event_type, self.source_player_name, self.target_player_name
+
+    # events are rebuilt from the columnar history on demand, so compare them by value
+    def __eq__(self, other):
+        return isinstance(other, GameEvent) and self.GetTuple() == other.GetTuple()
+
+    def __hash__(self):
+        return hash(self.GetTuple())
+
+    def __repr__(self):
+        return 'GameEvent(%d, %s, %s, %s)' % self.GetTuple()
+
+
+class EventList(list):
+    """ Read-only list of the events of a GameEventHistory, events are added with AddEvent. """
+
+    def ReadOnly(self, *args, **kwargs):
+        raise TypeError('GameEventHistory.event_list is read-only, use GameEventHistory.AddEvent')
+
+    append = extend = insert = remove = pop = clear = sort = reverse = ReadOnly
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = ReadOnly
+
+
+class EventCursor:
+    """ Position in a GameEventHistory, see GameEventHistory.GetCursor. """
+
+    def __init__(self, sequence, first_sequence, columns):
+        self.sequence = sequence  # sequence number the next event gets
+        self.first_sequence = first_sequence
+        self.columns = columns  # the history's column lists when the cursor was taken
+
+
+# column names of exported events
+EVENT_COLUMNS = ['tick', 'event_type', 'source_player', 'target_player']
+
+
+class HistoryPolicy:
+    """
+    How much per tick and event history a simulation keeps.
+    max_ticks bounds every mode but ALL and OFF, the replay window is whatever is retained in
+    memory. An episode starts with every START_PLAY, i.e. at kick off and after each goal, and
+    ends with GAME_OVER.
+    """
+    ALL = 'all'  # keep everything
+    OFF = 'off'  # keep nothing
+    RING = 'ring'  # keep the last max_ticks ticks
+    # keep the current episode, at most its last max_ticks ticks, nothing after GAME_OVER
+    EPISODE = 'episode'
+    SPILL = 'spill'  # write every max_ticks ticks to spill_dir and drop them from memory
+    MODES = [ALL, OFF, RING, EPISODE, SPILL]
+    EPISODE_MAX_TICKS = 10000  # max_ticks of EPISODE when not given
+
+    def __init__(self, mode=ALL, max_ticks=None, spill_dir=None):
+        assert (mode in self.MODES)
+        assert (max_ticks is not None or mode not in (self.RING, self.SPILL))
+        assert (spill_dir is not None or mode != self.SPILL)
+        if mode == self.EPISODE and max_ticks is None:
+            max_ticks = self.EPISODE_MAX_TICKS
+        self.mode = mode
+        self.max_ticks = None if mode in (self.ALL, self.OFF) else max_ticks
+        self.spill_dir = spill_dir
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def GetSpillPath(self, kind, first_tick, extension):
+        return os.path.join(self.spill_dir, '%s_%09d.%s' % (kind, first_tick, extension))
+
 
 class GameEventHistory:
-    def __init__(self):
-        self.event_list = []
+    """
+    Events in the order they were added, stored as parallel columns with the event types as
+    categorical codes, and indexed by type, source player, target player and tick.
+    Every event gets a sequence number and the per key indices list sequence numbers in
+    increasing order. Events arrive in tick order, so a query bisects the tick range and the
+    shortest matching index and only looks at the events in between.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy if policy is not None else HistoryPolicy()
+        self.event_types = []  # categories of the type codes, in order of first appearance
+        self.event_type_codes = {}
+        self.closed = False  # AddEvent ignores events, e.g. after the end of an episode
+        self.ticks = []
+        self.first_sequence = 0  # sequence number of the first retained event
+        self.Clear()
+
+    def Clear(self):
+        """ Forgets the retained events, sequence numbers keep counting up. """
+        self.first_sequence += len(self.ticks)
+        # the columns are only ever appended to or cut at the end, dropping events replaces them,
+        # so the columns a cursor holds keep the events it points into, see Truncate
+        self.ticks = []  # never decreasing
+        self.type_codes = []
+        self.source_player_names = []
+        self.target_player_names = []
+        # event_type, source_player_name and target_player_name -> sequence numbers
+        self.indices = ({}, {}, {})
+        self.dropped = 0  # sequence numbers in the indices older than the first retained event
+        self.events = None  # event_list, extended on access and replaced when events go
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def GetEvent(self, i):
+        return GameEvent(self.ticks[i], self.event_types[self.type_codes[i]],
+                         self.source_player_names[i], self.target_player_names[i])
+
+    @property
+    def event_list(self):
+        """
+        The retained events as a read-only EventList of GameEvent. The list is extended with the
+        events added since the last access, dropping or truncating events starts a new one.
+        """
+        if self.events is None:
+            self.events = EventList()
+        events = self.events
+        if len(events) < len(self.ticks):
+            list.extend(events, [self.GetEvent(i) for i in range(len(events), len(self.ticks))])
+        return events
 
     def AddEvent(self, e):
-        self.event_list.append(e)
+        if self.policy.mode == HistoryPolicy.OFF or self.closed:
+            return
+        self.Advance(e.tick)
+
+        code = self.event_type_codes.get(e.event_type)
+        if code is None:
+            code = len(self.event_types)
+            self.event_types.append(e.event_type)
+            self.event_type_codes[e.event_type] = code
+
+        self.IndexEvent(self.first_sequence + len(self.ticks), e.event_type,
+                        e.source_player_name, e.target_player_name)
+        self.ticks.append(e.tick)
+        self.type_codes.append(code)
+        self.source_player_names.append(e.source_player_name)
+        self.target_player_names.append(e.target_player_name)
+
+    def Advance(self, tick):
+        """ Drops or spills the events that are outside of the window ending at tick. """
+        policy = self.policy
+        if policy.max_ticks is None or not self.ticks:
+            return
+        if policy.mode == HistoryPolicy.SPILL:
+            first_tick = self.ticks[0] // policy.max_ticks * policy.max_ticks
+            if tick >= first_tick + policy.max_ticks:
+                self.Spill(policy.GetSpillPath('events', first_tick, 'json'))
+        else:
+            self.DropFront(bisect.bisect_right(self.ticks, tick - policy.max_ticks))
+
+    def IndexEvent(self, sequence, *keys):
+        for index, key in zip(self.indices, keys):
+            sequences = index.get(key)
+            if sequences is None:
+                index[key] = [sequence]
+            else:
+                sequences.append(sequence)
+
+    def DropFront(self, count):
+        if count == 0:
+            return
+        self.ticks = self.ticks[count:]
+        self.type_codes = self.type_codes[count:]
+        self.source_player_names = self.source_player_names[count:]
+        self.target_player_names = self.target_player_names[count:]
+        self.first_sequence += count
+        self.dropped += count
+        self.events = None
+        if self.dropped > len(self.ticks):
+            self.Reindex()
+
+    def GetColumns(self):
+        return self.ticks, self.type_codes, self.source_player_names, self.target_player_names
+
+    def GetCursor(self):
+        """ Current position as an EventCursor, see Truncate. """
+        return EventCursor(self.first_sequence + len(self.ticks), self.first_sequence,
+                           self.GetColumns())
+
+    def Truncate(self, cursor):
+        """
+        Rolls the history back to the events it held when GetCursor returned cursor. That
+        works after the events were dropped, cleared or spilled too, the cursor keeps them.
+        Cursors taken after cursor are no longer valid.
+        """
+        count = cursor.sequence - cursor.first_sequence
+        if cursor.columns[0] is not self.ticks:
+            # the retained events changed since, go back to the cursor's columns
+            self.ticks, self.type_codes, self.source_player_names, self.target_player_names = \
+                cursor.columns
+            self.first_sequence = cursor.first_sequence
+            if count > len(self.ticks):
+                raise ValueError('the events of the cursor were already truncated')
+            for column in self.GetColumns():
+                del column[count:]
+            self.events = None
+            self.Reindex()
+            return
+
+        if count > len(self.ticks):
+            raise ValueError('the events of the cursor were already truncated')
+        if count == len(self.ticks):
+            return
+        for column in self.GetColumns():
+            del column[count:]
+        self.events = None
+        for index in self.indices:
+            for key in [key for key, sequences in index.items() if
+                        sequences[-1] >= cursor.sequence]:
+                sequences = index[key]
+                del sequences[bisect.bisect_left(sequences, cursor.sequence):]
+                if not sequences:
+                    del index[key]
+
+    def Reindex(self):
+        # rebuild the indices without the sequence numbers of dropped events
+        self.indices = ({}, {}, {})
+        self.dropped = 0
+        for i in range(len(self.ticks)):
+            self.IndexEvent(self.first_sequence + i, self.event_types[self.type_codes[i]],
+                            self.source_player_names[i], self.target_player_names[i])
+
+    def Spill(self, path):
+        with open(path, 'w') as f:
+            json.dump([list(e.GetTuple()) for e in self.event_list], f)
+        self.Clear()
 
     def EventMatches(self, e, event_type=None, min_tick=None, max_tick=None,
                      source_player_name=None, target_player_name=None):
@@ -54,38 +278,110 @@ class GameEventHistory:
 
         return True
 
+    def CandidatePositions(self, event_type, min_tick, max_tick, source_player_name,
+                           target_player_name, reverse=False):
+        # positions of the events in the tick range that are in the shortest index of the
+        # given keys, the other keys still have to be checked
+        begin = 0 if min_tick is None else bisect.bisect_left(self.ticks, min_tick)
+        end = len(self.ticks) if max_tick is None else bisect.bisect_right(self.ticks, max_tick)
+        keyed = [index.get(key, []) for index, key in
+                 zip(self.indices, (event_type, source_player_name, target_player_name)) if
+                 key is not None]
+        if not keyed:
+            return range(end - 1, begin - 1, -1) if reverse else range(begin, end)
+
+        sequences = min(keyed, key=len)
+        first = bisect.bisect_left(sequences, begin + self.first_sequence)
+        last = bisect.bisect_left(sequences, end + self.first_sequence)
+        offset = self.first_sequence
+        order = range(last - 1, first - 1, -1) if reverse else range(first, last)
+        return (sequences[i] - offset for i in order)
+
+    def PositionMatches(self, i, event_type, source_player_name, target_player_name):
+        return (event_type is None or self.event_types[self.type_codes[i]] == event_type) and \
+               (source_player_name is None or self.source_player_names[i] == source_player_name) \
+               and (target_player_name is None or self.target_player_names[i] ==
+                    target_player_name)
+
+    def FindPositions(self, event_type=None, min_tick=None, max_tick=None,
+                      source_player_name=None, target_player_name=None):
+        return [i for i in self.CandidatePositions(event_type, min_tick, max_tick,
+                                                   source_player_name, target_player_name) if
+                self.PositionMatches(i, event_type, source_player_name, target_player_name)]
+
     def FindEvents(self, event_type=None, min_tick=None, max_tick=None, source_player_name=None,
                    target_player_name=None):
-        l = []
-        for e in self.event_list:
-            if self.EventMatches(e, event_type, min_tick, max_tick, source_player_name,
-                                 target_player_name):
-                l.append(e)
-
-        return l
+        return [self.GetEvent(i) for i in
+                self.FindPositions(event_type, min_tick, max_tick, source_player_name,
+                                   target_player_name)]
 
     def FindMostRecentEvent(self, event_type=None, min_tick=None, max_tick=None,
                             source_player_name=None, target_player_name=None):
-        for e in self.event_list[-1::-1]:
-            if self.EventMatches(e, event_type, min_tick, max_tick, source_player_name,
-                                 target_player_name):
-                return e
+        for i in self.CandidatePositions(event_type, min_tick, max_tick, source_player_name,
+                                         target_player_name, reverse=True):
+            if self.PositionMatches(i, event_type, source_player_name, target_player_name):
+                return self.GetEvent(i)
         return None
 
+    def ToColumns(self, l=None):
+        """
+        Events as a dict of equal length lists keyed by EVENT_COLUMNS, which pandas, pyarrow
+        and numpy all take in one call. l is an optional list of events, e.g. from FindEvents,
+        by default all retained events are exported.
+        """
+        if l is not None:
+            return {'tick': [e.tick for e in l], 'event_type': [e.event_type for e in l],
+                    'source_player': [e.source_player_name for e in l],
+                    'target_player': [e.target_player_name for e in l]}
+        event_types = self.event_types
+        return {'tick': list(self.ticks),
+                'event_type': [event_types[code] for code in self.type_codes],
+                'source_player': list(self.source_player_names),
+                'target_player': list(self.target_player_names)}
+
+    def ToRecords(self, l=None):
+        """ Events as a NumPy record array with an integer tick and string columns. """
+        return ColumnsToRecords(self.ToColumns(l))
+
     def EventListToDataFrame(self, l=None):
-        if l is None:
-            l = self.event_list
+        from sts2.game import pandas_adapter
+        return pandas_adapter.EventHistoryToDataFrame(self, l)
+
+
+def ColumnsToRecords(columns):
+    arrays = []
+    for name, values in columns.items():
+        if name == 'tick':
+            arrays.append(numpy.array(values, dtype=numpy.int64))
+        else:
+            arrays.append(numpy.array(values) if values else numpy.array(values, dtype=str))
+    return numpy.rec.fromarrays(arrays, names=list(columns.keys()))
+
 
-        df = pandas.DataFrame(columns=['tick', 'event_type', 'source_player', 'target_player'])
-        i = 0
-        for e in l:
-            df.loc[i, 'tick'] = e.tick
-            df.loc[i, 'event_type'] = e.event_type
-            df.loc[i, 'source_player'] = e.source_player_name
-            df.loc[i, 'target_player'] = e.target_player_name
-            i += 1
+def EventHistoriesToColumns(histories, episodes=None):
+    """
+    Concatenated columns of many event histories, e.g. one per episode, with an extra
+    'episode' column holding episodes[i] (by default i) for the events of histories[i].
+    """
+    if episodes is None:
+        episodes = range(len(histories))
+    columns = {'episode': []}
+    columns.update({name: [] for name in EVENT_COLUMNS})
+    for history, episode in zip(histories, episodes):
+        history_columns = history.ToColumns()
+        columns['episode'].extend([episode] * len(history))
+        for name in EVENT_COLUMNS:
+            columns[name].extend(history_columns[name])
+    return columns
 
-        return df
+
+def EventHistoriesToRecords(histories, episodes=None):
+    return ColumnsToRecords(EventHistoriesToColumns(histories, episodes))
+
+
+def EventHistoriesToDataFrame(histories, episodes=None):
+    from sts2.game import pandas_adapter
+    return pandas_adapter.EventHistoriesToDataFrame(histories, episodes)
 
 
 class Simulation:
@@ -93,15 +389,17 @@ class Simulation:
     WIN_REWARD = 1.0
     LOSS_REWARD = -1.0
 
-    def __init__(self, players, verbosity=0):
+    def __init__(self, players, verbosity=0, history_policy=None):
         self.players = players
         self.verbosity = max(0, verbosity)
         self.tick = 0
         self.player_identity_list = [None] * len(players)  # subclass should fill
+        self.history_policy = history_policy if history_policy is not None else HistoryPolicy()
         self.game_state_history = []
         self.game_state_vector = None
         self._WipePlayerActionsAndRewardsForThisTick()
-        self.game_event_history = GameEventHistory()
+        self.game_event_history = GameEventHistory(self.history_policy)
+        self.episode_over = False  # the episode ended, see HistoryPolicy.EPISODE
 
     def update(self, record_game_state=True):
         if self.verbosity > 1:
@@ -109,10 +407,26 @@ class Simulation:
 
         self._WipePlayerActionsAndRewardsForThisTick()
         self.CustomTick()
-        if record_game_state:
+        if record_game_state and self.history_policy.mode != HistoryPolicy.OFF and \
+                not self.episode_over:
             self._AddGameStateHistoryForThisTick()
+        self.game_event_history.Advance(self.tick)
+        if self.history_policy.mode == HistoryPolicy.EPISODE and self.IsEpisodeOver():
+            # the last tick of the episode is recorded, nothing after it
+            self.SetEpisodeOver(True)
         self.tick += 1
 
+    def StartEpisode(self):
+        # called when a new episode starts, drops the history of the previous one if asked to
+        if self.history_policy.mode == HistoryPolicy.EPISODE:
+            self._ClearGameStateHistory()
+            self.game_event_history.Clear()
+        self.SetEpisodeOver(False)
+
+    def SetEpisodeOver(self, episode_over):
+        self.episode_over = episode_over
+        self.game_event_history.closed = episode_over
+
     def Simulate(self):
         # this method need not be overridden and can be called from a different context if needed
 
@@ -137,11 +451,22 @@ class Simulation:
                              self.player_action_list, self.player_value_estimate_list,
                              self.player_reward_list)
         self.game_state_history.append(h)
+        # the plain list supports the in memory policies only, Game records with spilling
+        assert (self.history_policy.mode != HistoryPolicy.SPILL)
+        if self.history_policy.max_ticks is not None:
+            del self.game_state_history[:-self.history_policy.max_ticks]
+
+    def _ClearGameStateHistory(self):
+        self.game_state_history = []
 
     def CustomTick(self):
         # override this method with simulation specific logic
         pass
 
+    def IsEpisodeOver(self):
+        # should return true once the current episode has ended, see HistoryPolicy.EPISODE
+        return False
+
     def IsSimulationComplete(self):
         # should return true if simulation is complete
         raise NotImplementedError
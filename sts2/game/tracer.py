@@ -0,0 +1,88 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+Timeline tracing in the Chrome Trace Event format, viewable in chrome://tracing or Perfetto.
+ChromeTracer is a TickProfiler that also writes every timed stage as a span and every game
+event as an instant, so a slow tick can be followed down to the stage and the event that
+caused it. Events are buffered and appended to the file in batches.
+"""
+
+import json
+import os
+import threading
+import time
+
+from sts2.game.profiler import TickProfiler
+
+
+class ChromeTracer(TickProfiler):
+    def __init__(self, path, batch_size=10000):
+        super(ChromeTracer, self).__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self.buffer = []
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.game = None
+        self.file = open(path, 'w')
+        # a JSON array, the viewers also accept it unterminated if the run dies
+        self.file.write('[\n')
+        self.Emit({'name': 'process_name', 'ph': 'M', 'args': {'name': 'sts2'}})
+
+    def Attach(self, game):
+        super(ChromeTracer, self).Attach(game)
+        self.game = game
+        history = game.game_event_history
+        add_event = type(history).AddEvent.__get__(history)
+
+        def TracedAddEvent(e):
+            self.Emit({'name': e.event_type, 'cat': 'event', 'ph': 'i', 's': 't',
+                       'ts': self.Now(), 'args': {'tick': e.tick, 'source': e.source_player_name,
+                                                  'target': e.target_player_name}})
+            add_event(e)
+
+        history.AddEvent = TracedAddEvent
+
+    def Detach(self, game):
+        super(ChromeTracer, self).Detach(game)
+        game.game_event_history.__dict__.pop('AddEvent', None)
+
+    def Now(self):
+        return (time.perf_counter_ns() - self.origin) * 1e-3
+
+    def Record(self, stage, start, duration):
+        super(ChromeTracer, self).Record(stage, start, duration)
+        span = {'name': stage, 'cat': 'stage', 'ph': 'X', 'ts': (start - self.origin) * 1e-3,
+                'dur': duration * 1e-3}
+        if stage == 'Game.CustomTick' and self.game is not None:
+            span['cat'] = 'tick'
+            span['args'] = {'tick': self.game.tick}
+        self.Emit(span)
+
+    def Emit(self, event):
+        event['pid'] = self.pid
+        event['tid'] = threading.get_ident()
+        self.buffer.append(event)
+        if len(self.buffer) >= self.batch_size:
+            self.Flush()
+
+    def Flush(self):
+        if self.buffer:
+            self.file.write(''.join(json.dumps(event) + ',\n' for event in self.buffer))
+            self.buffer = []
+        self.file.flush()
+
+    def Close(self):
+        if self.file.closed:
+            return
+        self.Flush()
+        # the trailing comma of the last event needs one more element to be valid JSON
+        self.file.write(json.dumps({'name': 'trace_end', 'ph': 'i', 's': 'g', 'ts': self.Now(),
+                                    'pid': self.pid, 'tid': threading.get_ident()}) + '\n]\n')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
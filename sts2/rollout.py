@@ -0,0 +1,248 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+Multi-process rollout collection.
+K worker processes each own a few games built by environment.get_game and write fixed-length
+chunks of experience straight into a ring of slots in shared memory. The learner takes filled
+slots, reads them as NumPy views without any pickling and hands them back when done. Workers
+block while no slot is free, so a slow learner throttles collection instead of queueing
+unbounded data.
+fork_rollouts is the planning counterpart: it plays out candidate branches of one running game
+on forks of it, serially or in a thread or process pool.
+"""
+
+import multiprocessing
+import queue
+import time
+import traceback
+
+import numpy as np
+
+from sts2.environment import get_game
+from sts2.game.game_state import Action, GameStateLayout
+from sts2.game.settings import GamePhase, TeamSide
+from sts2.vector_env import ACTION_SIZE, SharedBlock, apply_agent_actions, create_shared_array, \
+    get_agent_players, shared_array
+
+NONE_INDEX = Action.ACTION_LIST.index(Action.NONE)
+INPUT = slice(GameStateLayout.INPUT_OFFSET, GameStateLayout.INPUT_OFFSET + 2)
+
+
+class RolloutChunk:
+    """ One filled slot: every array is a view into shared memory, valid until released. """
+
+    def __init__(self, slot, worker, sequence, arrays):
+        self.slot = slot
+        self.worker = worker
+        self.sequence = sequence  # per worker chunk counter
+        self.observation = arrays['observation']  # (steps, games, observation_size)
+        self.action = arrays['action']  # (steps, games, players) indices into Action.ACTION_LIST
+        self.input = arrays['input']  # (steps, games, players, 2)
+        self.reward = arrays['reward']  # (steps, games, players)
+        self.done = arrays['done']  # (steps, games)
+
+
+def _worker(worker, seed, shm_specs, free_slots, full_slots, errors, stop, game_args,
+            games_per_worker, chunk_length, policy):
+    buffers = {name: shared_array(SharedBlock(name=shm_name), shape, dtype) for
+               name, (shm_name, shape, dtype) in shm_specs.items()}
+    try:
+        # every game, restarted ones included, draws from its own stream spawned from seed
+        games = [get_game(*game_args, seed=child) for child in seed.spawn(games_per_worker)]
+        agents = [get_agent_players(game) for game in games]
+        num_agents = len(agents[0])
+        actions = np.zeros((games_per_worker, num_agents, ACTION_SIZE), dtype=np.float32)
+        actions[..., 0] = NONE_INDEX
+        sequence = 0
+
+        while not stop.is_set():
+            try:
+                slot = free_slots.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            observation = buffers['observation'][slot]
+            for t in range(chunk_length):
+                for g, game in enumerate(games):
+                    observation[t, g] = game.state.values
+                if policy is not None and num_agents:
+                    actions[...] = policy(observation[t])
+
+                for g, game in enumerate(games):
+                    apply_agent_actions(game, agents[g], actions[g])
+                    game.update(record_game_state=False)
+                    buffers['action'][slot, t, g] = game.player_action_list
+                    buffers['input'][slot, t, g] = game.state.layout.PlayerBlock(
+                        game.state.values)[:, INPUT]
+                    buffers['reward'][slot, t, g] = game.player_reward_list
+                    done = game.GetGamePhase() == GamePhase.GAME_OVER
+                    buffers['done'][slot, t, g] = done
+                    if done:
+                        games[g] = get_game(*game_args, seed=seed.spawn(1)[0])
+                        agents[g] = get_agent_players(games[g])
+
+            buffers['info'][slot] = (worker, sequence)
+            sequence += 1
+            full_slots.put(slot)
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        # raised again in the learner, see RolloutCollector.get
+        errors.put((worker, traceback.format_exc()))
+
+
+def score_difference(game):
+    """ Home minus away goals, the default rollout score. """
+    return game.GetScore(TeamSide.HOME) - game.GetScore(TeamSide.AWAY)
+
+
+def _play_branch(game, branch, num_ticks, score):
+    if branch is not None:
+        branch(game)
+    for _ in range(num_ticks):
+        game.update(record_game_state=False)
+    return score(game)
+
+
+def fork_rollouts(game, branches, num_ticks, score=score_difference, executor=None,
+                  independent=False):
+    """
+    Plays every branch num_ticks ticks ahead on its own fork of game and returns the scores in
+    branch order. A branch is called with the fork before the first tick, e.g. to hand the
+    agents a candidate action, None plays on unchanged. The forks share game's random stream,
+    which compares the branches under the same luck, unless independent is set, in which case
+    each gets a stream spawned from the game's seed. With a concurrent.futures executor the
+    branches run in its pool; a ProcessPoolExecutor needs picklable branches and score.
+    """
+    if independent:
+        forks = [game.fork(seed=seed) for seed in game.seed_sequence.spawn(len(branches))]
+    else:
+        forks = [game.fork() for _ in branches]
+    if executor is None:
+        return [_play_branch(fork, branch, num_ticks, score) for fork, branch in
+                zip(forks, branches)]
+    futures = [executor.submit(_play_branch, fork, branch, num_ticks, score) for fork, branch in
+               zip(forks, branches)]
+    return [future.result() for future in futures]
+
+
+class RolloutCollector(object):
+    """
+    Collects experience with num_workers processes, each stepping games_per_worker games.
+    Every chunk holds chunk_length consecutive steps of one worker's games, num_slots chunks are
+    buffered in shared memory. policy, if given, is called in the workers with a
+    (games_per_worker, observation_size) float32 array and must return a
+    (games_per_worker, num_agents, ACTION_SIZE) action array like STS2VectorEnv takes; it has to
+    be picklable with the chosen start method. Each worker spawns the random streams of its games
+    from a SeedSequence spawned from seed.
+    """
+
+    def __init__(self, num_workers, games_per_worker=1, chunk_length=128, num_slots=None, *,
+                 policy=None, seed=0, start_method=None, num_home_players=3, num_away_players=3,
+                 num_home_agents=0, num_away_agents=0, timeout_ticks=1e10):
+        self.num_workers = num_workers
+        game_args = (num_home_players, num_away_players, num_home_agents, num_away_agents,
+                     timeout_ticks)
+        probe = get_game(*game_args)
+        observation_size = probe.state.layout.num_slots
+        self.observation_fields = probe.state.layout.slot_names
+        num_players = len(probe.players)
+        if num_slots is None:
+            num_slots = 2 * num_workers
+        self.num_slots = num_slots
+
+        steps = (num_slots, chunk_length, games_per_worker)
+        specs = {
+            'observation': (steps + (observation_size,), np.float32),
+            'action': (steps + (num_players,), np.int8),
+            'input': (steps + (num_players, 2), np.float32),
+            'reward': (steps + (num_players,), np.float32),
+            'done': (steps, np.bool_),
+            'info': ((num_slots, 2), np.int64),
+        }
+        self.blocks = []
+        self.buffers = {}
+        shm_specs = {}
+        for name, (shape, dtype) in specs.items():
+            self.buffers[name] = create_shared_array(shape, dtype)
+            self.blocks.append(self.buffers[name].block)
+            shm_specs[name] = (self.buffers[name].block.name, shape, np.dtype(dtype).str)
+
+        ctx = multiprocessing.get_context(start_method)
+        self.free_slots = ctx.Queue()
+        self.full_slots = ctx.Queue()
+        self.errors = ctx.Queue()
+        for slot in range(num_slots):
+            self.free_slots.put(slot)
+        self.stop = ctx.Event()
+
+        seeds = np.random.SeedSequence(seed).spawn(num_workers)
+        self.processes = []
+        for worker in range(num_workers):
+            process = ctx.Process(target=_worker, args=(
+                worker, seeds[worker], shm_specs, self.free_slots, self.full_slots, self.errors,
+                self.stop, game_args, games_per_worker, chunk_length, policy),
+                                  daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def get(self, timeout=None):
+        """
+        Next filled chunk, blocks until one is ready (queue.Empty after timeout seconds). Raises
+        a RuntimeError when a worker failed or exited.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.check_workers()
+            wait = 0.1 if deadline is None else max(0.0, min(0.1, deadline - time.monotonic()))
+            try:
+                slot = self.full_slots.get(timeout=wait)
+                break
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+        worker, sequence = self.buffers['info'][slot]
+        arrays = {name: self.buffers[name][slot] for name in
+                  ('observation', 'action', 'input', 'reward', 'done')}
+        return RolloutChunk(slot, int(worker), int(sequence), arrays)
+
+    def check_workers(self):
+        """ Raises the error of a failed worker, or reports one that exited. """
+        dead = [worker for worker, process in enumerate(self.processes) if not process.is_alive()]
+        try:
+            # a worker puts its error before it exits
+            worker, error = self.errors.get(timeout=1.0 if dead else 0.0)
+        except queue.Empty:
+            if dead:
+                raise RuntimeError('rollout worker %d exited with code %s' % (
+                    dead[0], self.processes[dead[0]].exitcode))
+            return
+        raise RuntimeError('rollout worker %d failed:\n%s' % (worker, error))
+
+    def release(self, chunk):
+        """ Returns the chunk's slot to the workers, its arrays must not be used afterwards. """
+        self.free_slots.put(chunk.slot)
+
+    def close(self):
+        self.stop.set()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.processes = []
+        for q in (self.free_slots, self.full_slots, self.errors):
+            q.cancel_join_thread()
+            q.close()
+
+        self.buffers = {}
+        # the mappings go away with the last arrays over them, e.g. of chunks still held
+        for block in self.blocks:
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
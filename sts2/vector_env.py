@@ -0,0 +1,271 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+"""
+Batched wrapper over many STS2Environment instances.
+Observations, actions, rewards and dones are exchanged as stacked NumPy arrays so a policy can run
+inference over all environments at once. The 'sync' backend steps the environments in this
+process, the 'subprocess' backend spreads them over worker processes that read actions from and
+write results to shared memory, so only a short command goes through the pipes.
+"""
+
+import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from sts2.environment import STS2Environment
+from sts2.game.game_state import Action
+from sts2.game.settings import GamePhase
+
+# layout of the last axis of the action array
+ACTION_INDEX = 0  # index into Action.ACTION_LIST
+ACTION_INPUT = slice(1, 3)  # continuous input x, z
+ACTION_SIZE = 3
+
+
+class SharedBlock(shared_memory.SharedMemory):
+    """ SharedMemory that is closed by the last SharedArray over it. """
+
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            # the array dropping the block still exports the mapping, which is unmapped
+            # when that export is released right after
+            pass
+
+
+class SharedArray(np.ndarray):
+    """ Array over a SharedBlock, it and every view of it keep the block open. """
+
+    def __array_finalize__(self, obj):
+        self.block = getattr(obj, 'block', None)
+
+
+def shared_array(block, shape, dtype):
+    array = np.frombuffer(block.buf, dtype=dtype, count=int(np.prod(shape))).reshape(
+        shape).view(SharedArray)
+    array.block = block
+    return array
+
+
+def create_shared_array(shape, dtype):
+    """ Zeroed SharedArray in a new block, unlink array.block when done with it. """
+    size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    array = shared_array(SharedBlock(create=True, size=size), shape, dtype)
+    array[...] = 0
+    return array
+
+
+def get_agent_players(game):
+    return game.client_adapter.GetAgents()
+
+
+def apply_agent_actions(game, agents, actions):
+    """ Hands an (agents, ACTION_SIZE) array to the game's client adapter. """
+    game.client_adapter.receive_action_arrays(actions[:, ACTION_INDEX], actions[:, ACTION_INPUT])
+
+
+def step_env(env, agents, actions, buffers, i):
+    """ Steps environment i with an (agents, ACTION_SIZE) array and writes its results. """
+    apply_agent_actions(env.game, agents, actions)
+    env.update()
+
+    game = env.game
+    for agent, player in enumerate(agents):
+        buffers['reward'][i, agent] = game.player_reward_list[game.registry.GetGlobalIndex(player)]
+    done = game.GetGamePhase() == GamePhase.GAME_OVER
+    buffers['done'][i] = done
+    if done:
+        buffers['terminal_observation'][i] = game.state.values
+        env.restart()
+        agents[:] = get_agent_players(env.game)
+    buffers['observation'][i] = env.game.state.values
+
+
+class SyncBackend:
+    def __init__(self, num_envs, env_kwargs, buffers):
+        self.buffers = buffers
+        self.envs = [STS2Environment(**env_kwargs) for _ in range(num_envs)]
+        self.agents = [get_agent_players(env.game) for env in self.envs]
+
+    def seed(self, seeds):
+        for env, seed in zip(self.envs, seeds):
+            env.seed(seed)
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            env.restart()
+            self.agents[i] = get_agent_players(env.game)
+            self.buffers['observation'][i] = env.game.state.values
+
+    def step(self):
+        for i, env in enumerate(self.envs):
+            step_env(env, self.agents[i], self.buffers['action'][i], self.buffers, i)
+
+    def close(self):
+        self.envs = []
+
+
+def _worker(pipe, shm_specs, start, stop, env_kwargs):
+    try:
+        buffers = {name: shared_array(SharedBlock(name=shm_name), shape, dtype)[start:stop] for
+                   name, (shm_name, shape, dtype) in shm_specs.items()}
+        backend = SyncBackend(stop - start, env_kwargs, buffers)
+        while True:
+            command, data = pipe.recv()
+            if command == 'step':
+                backend.step()
+            elif command == 'reset':
+                backend.reset()
+            elif command == 'seed':
+                backend.seed(data)
+            elif command == 'close':
+                break
+            pipe.send(None)
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        # raised again in the parent, see SubprocessBackend._call
+        pipe.send(traceback.format_exc())
+    finally:
+        pipe.close()
+
+
+class SubprocessBackend:
+    def __init__(self, num_envs, env_kwargs, buffers, num_workers, start_method, shm_specs):
+        ctx = multiprocessing.get_context(start_method)
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self.bounds = list(zip(bounds[:-1], bounds[1:]))
+        self.pipes = []
+        self.processes = []
+        for start, stop in self.bounds:
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=_worker,
+                                  args=(child, shm_specs, start, stop, env_kwargs), daemon=True)
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def _call(self, command, data=None):
+        for pipe, item in zip(self.pipes, data if data is not None else [None] * len(self.pipes)):
+            try:
+                pipe.send((command, item))
+            except (BrokenPipeError, OSError):
+                pass  # the worker is gone, its error or EOF is read below
+        # every worker answers before anything is raised, so the pipes stay in step
+        errors = []
+        for pipe in self.pipes:
+            try:
+                error = pipe.recv()
+            except EOFError:
+                error = 'worker exited'
+            if error is not None:
+                errors.append(error)
+        if errors:
+            raise RuntimeError('vector env worker failed:\n' + errors[0])
+
+    def seed(self, seeds):
+        self._call('seed', [seeds[start:stop] for start, stop in self.bounds])
+
+    def reset(self):
+        self._call('reset')
+
+    def step(self):
+        self._call('step')
+
+    def close(self):
+        for pipe in self.pipes:
+            try:
+                pipe.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.pipes = []
+        self.processes = []
+
+
+class STS2VectorEnv(object):
+    """
+    Steps num_envs environments together.
+    step takes a (num_envs, num_agents, ACTION_SIZE) array holding the action index and the
+    continuous input of every agent, and returns the stacked (num_envs, observation_size)
+    observations, (num_envs, num_agents) rewards and (num_envs,) dones. Observations are the
+    GameState vectors, see observation_fields for the name of every column. Environments whose
+    game is over restart automatically, their last observation is in info['terminal_observation'].
+    The returned arrays are reused between steps, copy them to keep them.
+    """
+
+    def __init__(self, num_envs, *, backend='sync', num_workers=None, start_method=None,
+                 **env_kwargs):
+        assert not env_kwargs.get('with_pygame'), 'rendering is not supported when vectorized'
+        self.num_envs = num_envs
+        self.env_kwargs = env_kwargs
+
+        probe = STS2Environment(**env_kwargs)
+        self.observation_fields = probe.game.state.layout.slot_names
+        self.agent_names = [player.name for player in get_agent_players(probe.game)]
+        self.num_agents = len(self.agent_names)
+        observation_size = len(self.observation_fields)
+
+        specs = {
+            'observation': ((num_envs, observation_size), np.float32),
+            'terminal_observation': ((num_envs, observation_size), np.float32),
+            'action': ((num_envs, self.num_agents, ACTION_SIZE), np.float32),
+            'reward': ((num_envs, self.num_agents), np.float32),
+            'done': ((num_envs,), np.bool_),
+        }
+
+        self.shared_blocks = []
+        if backend == 'sync':
+            self.buffers = {name: np.zeros(shape, dtype) for name, (shape, dtype) in specs.items()}
+            self.backend = SyncBackend(num_envs, env_kwargs, self.buffers)
+        elif backend == 'subprocess':
+            self.buffers = {}
+            shm_specs = {}
+            for name, (shape, dtype) in specs.items():
+                self.buffers[name] = create_shared_array(shape, dtype)
+                self.shared_blocks.append(self.buffers[name].block)
+                shm_specs[name] = (self.buffers[name].block.name, shape, np.dtype(dtype).str)
+            if num_workers is None:
+                num_workers = multiprocessing.cpu_count()
+            num_workers = max(1, min(num_workers, num_envs))
+            self.backend = SubprocessBackend(num_envs, env_kwargs, self.buffers, num_workers,
+                                             start_method, shm_specs)
+        else:
+            raise ValueError('unknown backend', backend)
+
+    def seed(self, seed):
+        # every sub-env gets its own spawned stream, so neighbouring seeds share none
+        self.backend.seed(np.random.SeedSequence(seed).spawn(self.num_envs))
+
+    def reset(self):
+        self.backend.reset()
+        return self.buffers['observation'], {}
+
+    def step(self, actions=None):
+        if actions is None:
+            self.buffers['action'][...] = 0
+            self.buffers['action'][..., ACTION_INDEX] = Action.ACTION_LIST.index(Action.NONE)
+        else:
+            self.buffers['action'][...] = actions
+        self.backend.step()
+        info = {'terminal_observation': self.buffers['terminal_observation']}
+        return self.buffers['observation'], self.buffers['reward'], self.buffers['done'], info
+
+    def close(self):
+        self.backend.close()
+        self.buffers = {}
+        # the mappings go away with the last arrays over them, e.g. ones returned by step
+        for block in self.shared_blocks:
+            block.unlink()
+        self.shared_blocks = []
+
+    def __del__(self):
+        if getattr(self, 'shared_blocks', None):
+            self.close()
@@ -0,0 +1,101 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import copy
+
+import numpy
+import pytest
+
+from sts2.environment import get_game
+from sts2.game.batch_game import BatchGame
+from sts2.game.game_state import Action, GameState, GameStateLayout
+from sts2.game.rules import STANDARD_GAME_RULES
+from sts2.game.settings import GamePhase, TeamSide
+
+
+def make_rules(max_tick):
+    rules = copy.copy(STANDARD_GAME_RULES)
+    rules.max_tick = max_tick
+    return rules
+
+
+def test_games_reset_after_game_over():
+    batch = BatchGame(8, 3, 3, num_home_agents=1, rules=make_rules(50), seed=0)
+    for tick in range(50):
+        actions = numpy.zeros((8, 1), dtype=int)
+        rewards, done = batch.step(actions, numpy.ones((8, 1, 2)))
+        assert rewards.shape == (8, 6)
+        assert not done.any()
+    rewards, done = batch.step()
+    assert done.all()
+    assert (batch.tick == 0).all()
+
+    final = batch.layout.Records(batch.terminal_values)
+    assert (final[GameState.CURRENT_PHASE][:, 0] == BatchGame.GAME_OVER).all()
+    assert batch.GetFrame(0).current_phase == GamePhase.PRE_GAME
+
+
+def test_seeded_runs_repeat():
+    first = BatchGame(16, 2, 2, rules=make_rules(30), seed=3)
+    second = BatchGame(16, 2, 2, rules=make_rules(30), seed=3)
+    for tick in range(25):
+        first.step()
+        second.step()
+    assert numpy.array_equal(first.values, second.values)
+
+
+def test_scores_match_scalar_game():
+    # the random draws differ from the scalar game's, so only the statistics can agree;
+    # test_ticks_match_scalar_game checks everything else exactly
+    max_tick = 100
+    batch = BatchGame(2000, 3, 3, rules=make_rules(max_tick), seed=0)
+    # a goal on the last tick delays the game over by a restart tick
+    for tick in range(max_tick + 2):
+        batch.step()
+    final = batch.layout.Records(batch.terminal_values)
+    batch_goals = (final['home_score'] + final['away_score']).mean()
+
+    scalar_goals = []
+    for episode in range(100):
+        game = get_game(3, 3, 0, 0, timeout_ticks=max_tick, seed=episode)
+        while game.GetGamePhase() != GamePhase.GAME_OVER:
+            game.update(record_game_state=False)
+        scalar_goals.append(game.GetScore(TeamSide.HOME) + game.GetScore(TeamSide.AWAY))
+
+    assert abs(batch_goals - numpy.mean(scalar_goals)) < 0.2
+
+
+@pytest.mark.parametrize('team_size', [2, 4])
+def test_ticks_match_scalar_game(team_size):
+    # every tick starts the batch from the scalar game's state; ticks that draw random numbers
+    # are only compared up to the draws: restarts by their phases, shots and passes up to the
+    # action outcomes
+    drawing_actions = [Action.ACTION_LIST.index(action) for action in
+                       [Action.SHOOT] + Action.PASSES]
+    for seed in range(5):
+        game = get_game(team_size, team_size, 0, 0, timeout_ticks=300, seed=seed)
+        batch = BatchGame(1, team_size, team_size, rules=game.rules)
+        phase_slots = [batch.layout.slots[GameState.PREVIOUS_PHASE],
+                       batch.layout.slots[GameState.CURRENT_PHASE]]
+        for tick in range(300):
+            restarting = game.GetGamePhase() in (GamePhase.PRE_GAME, GamePhase.STOPPAGE_GOAL)
+            batch.LoadValues(game.state.values[None], game.tick)
+            game.update(record_game_state=False)
+            rewards, _ = batch.step()
+            values = batch.values[0]
+
+            if restarting:
+                assert numpy.array_equal(values[phase_slots], game.state.values[phase_slots])
+            elif numpy.isin(game.state.actions, drawing_actions).any():
+                end = GameStateLayout.ACTION_TIME_OFFSET
+                assert numpy.array_equal(batch.player_block[0, :, :end],
+                                         game.state.player_block[:, :end])
+            else:
+                assert numpy.array_equal(values, game.state.values)
+                assert numpy.array_equal(rewards[0], game.player_reward_list)
+
+
+def test_distance_rank_ties_go_by_name():
+    batch = BatchGame(1, 11, 1, rules=make_rules(30))
+    rank = batch.RankByDistanceToController(numpy.zeros((1, batch.num_players)))
+    names = sorted(player.name for player in batch.team_players[TeamSide.HOME])
+    assert [names[r] for r in rank[0, :11]] == [p.name for p in batch.team_players[TeamSide.HOME]]
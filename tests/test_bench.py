@@ -0,0 +1,17 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import json
+
+from sts2 import bench
+
+
+def test_bench_writes_json_report(tmp_path):
+    output = str(tmp_path / 'bench.json')
+    bench.main(['--teams', '1', '--rules', 'STANDARD', '--ticks', '5', '--warmup', '1',
+                '--memory-ticks', '2', '--output', output, '--quiet'])
+    with open(output) as f:
+        report = json.load(f)
+    assert len(report['results']) == 2 * 2 * 2  # targets, agents, history
+    result = report['results'][0]
+    assert result['ticks_per_sec'] > 0 and result['peak_memory_bytes'] > 0
+    assert sorted(result['latency_us']) == ['max', 'mean', 'p50', 'p90', 'p99']
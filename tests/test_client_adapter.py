@@ -0,0 +1,82 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import numpy
+import pytest
+
+from sts2.client_adapter import ClientAdapter
+from sts2.environment import STS2Environment, get_game
+from sts2.game.game_state import Action
+
+
+def test_numeric_observations():
+    env = STS2Environment(num_home_agents=1, num_away_agents=1,
+                          observation_mode=ClientAdapter.OBSERVATION_VECTOR)
+    obs, metadata = env.reset()
+    assert obs.dtype == numpy.float32 and obs.shape == (len(metadata['fields']),)
+    assert metadata['agents'] == ['h_ai_1', 'a_ai_1']
+    next_obs, _, _, _ = env.step({})
+    assert next_obs is obs
+    assert numpy.array_equal(obs, env.game.state.values.astype(numpy.float32))
+
+    env = STS2Environment(num_home_agents=1, num_away_agents=1,
+                          observation_mode=ClientAdapter.OBSERVATION_MATRIX)
+    obs, metadata = env.reset()
+    env.step({})
+    game = env.game
+    assert obs.shape == (2, len(metadata['columns']))
+    assert metadata['players'][1][0] == 'a_ai_1'
+    away_agent = game.team_players[1][0]
+    home_first = game.team_players[0][0]
+    columns = metadata['columns']
+    assert numpy.allclose(obs[1, [columns.index('self_pos_x'), columns.index('self_pos_z')]],
+                          away_agent.GetPosition(game))
+    assert numpy.allclose(obs[1, [columns.index('opponent0_pos_x'),
+                                  columns.index('opponent0_pos_z')]],
+                          home_first.GetPosition(game))
+
+
+def test_matrix_columns_of_uneven_teams():
+    env = STS2Environment(num_home_players=3, num_away_players=2, num_home_agents=1,
+                          num_away_agents=1, observation_mode=ClientAdapter.OBSERVATION_MATRIX)
+    obs, metadata = env.reset()
+    env.step({})
+    game = env.game
+    columns = metadata['columns']
+    names = {player.name: player for player in game.players}
+    for row, order in zip(obs, metadata['players']):
+        # self, two teammates and three opponents, a missing away player is padding
+        assert len(order) == 6 and order.count('') == 1
+        for i, prefix in enumerate(['self', 'teammate0', 'teammate1', 'opponent0', 'opponent1',
+                                    'opponent2']):
+            position = row[[columns.index(prefix + '_pos_x'), columns.index(prefix + '_pos_z')]]
+            if order[i]:
+                assert numpy.allclose(position, names[order[i]].GetPosition(game))
+            else:
+                assert (position == 0).all()
+    assert metadata['players'][0][1:3] == [player.name for player in game.team_players[0][1:]]
+    assert metadata['players'][1][3:5] == [player.name for player in game.team_players[0][:2]]
+
+
+def test_array_actions():
+    games = [get_game(1, 1, 1, 1, 1e10), get_game(1, 1, 1, 1, 1e10)]
+    agents = games[0].client_adapter.GetAgents()
+    actions = numpy.array([Action.ACTION_LIST.index(Action.BLOCK),
+                           Action.ACTION_LIST.index(Action.NONE)])
+    inputs = numpy.array([[0.5, -0.5], [-1.0, 0.25]])
+    games[0].client_adapter.receive_action(
+        {player.name: {'action': Action.ACTION_LIST[a], 'input': i} for player, a, i in
+         zip(agents, actions, inputs)})
+    games[1].client_adapter.receive_action_arrays(actions, inputs)
+    for game in games:
+        for player in game.client_adapter.GetAgents():
+            player.Think(game, 0)
+    blocks = [game.state.layout.PlayerBlock(game.state.values) for game in games]
+    assert numpy.array_equal(blocks[0], blocks[1])
+    with pytest.raises(ValueError, match='action index out of range'):
+        games[1].client_adapter.receive_action_arrays(numpy.array([0, Action.NUM]), inputs)
+    with pytest.raises(ValueError, match='action indices must be integers'):
+        games[1].client_adapter.receive_action_arrays(numpy.array([2.7, 0.0]), inputs)
+    with pytest.raises(ValueError, match='inputs must be finite'):
+        games[1].client_adapter.receive_action_arrays(actions, numpy.full((2, 2), numpy.nan))
+    with pytest.raises(ValueError):
+        games[1].client_adapter.receive_action_arrays(actions[:1], inputs)
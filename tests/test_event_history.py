@@ -0,0 +1,101 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import random
+
+import numpy
+import pytest
+
+from sts2.game.simulation import EVENT_COLUMNS, EventHistoriesToDataFrame, GameEvent, \
+    GameEventHistory, HistoryPolicy
+
+
+def make_history(policy=None, count=2000):
+    rng = random.Random(0)
+    history = GameEventHistory(policy)
+    tick = 0
+    for _ in range(count):
+        tick += rng.randint(0, 2)
+        history.AddEvent(GameEvent(tick, rng.choice(['PASS', 'SHOT', 'CHECK']),
+                                   rng.choice(['p1', 'p2', '']), rng.choice(['p1', 'p2', ''])))
+    return history
+
+
+def test_indexed_queries_match_linear_scan():
+    for policy in [None, HistoryPolicy(HistoryPolicy.RING, max_ticks=50)]:
+        history = make_history(policy)
+        last_tick = history.event_list[-1].tick
+        for query in [{'event_type': 'PASS'},
+                      {'event_type': 'SHOT', 'source_player_name': 'p1',
+                       'min_tick': last_tick - 30},
+                      {'target_player_name': 'p2', 'min_tick': last_tick - 40,
+                       'max_tick': last_tick - 10},
+                      {'event_type': 'GOAL'}]:
+            expected = [e for e in history.event_list if history.EventMatches(e, **query)]
+            assert history.FindEvents(**query) == expected
+            assert history.FindMostRecentEvent(**query) == (expected[-1] if expected else None)
+
+
+def test_bulk_exports():
+    pytest.importorskip('pandas')  # requirements-viz.txt
+    history = make_history(count=300)
+    events = history.event_list
+    frame = history.EventListToDataFrame()
+    assert list(frame.columns) == EVENT_COLUMNS
+    assert len(frame) == 300
+    assert list(frame['tick']) == [e.tick for e in events]
+    assert list(frame['event_type'].astype(str)) == [e.event_type for e in events]
+
+    passes = history.FindEvents(event_type='PASS')
+    assert list(history.EventListToDataFrame(passes)['source_player']) == [
+        e.source_player_name for e in passes]
+
+    records = history.ToRecords()
+    assert records.tick.dtype == numpy.int64 and list(records.target_player) == [
+        e.target_player_name for e in events]
+
+    other = make_history(count=50)
+    combined = EventHistoriesToDataFrame([history, other], episodes=['a', 'b'])
+    assert len(combined) == 350
+    assert list(combined['episode'][-50:]) == ['b'] * 50
+
+
+def test_event_list_is_a_cached_read_only_view():
+    history = make_history(count=20)
+    events = history.event_list
+    assert history.event_list is events
+    with pytest.raises(TypeError):
+        events.append(GameEvent(100, 'PASS', 'p1', 'p2'))
+    assert len(history.event_list) == 20
+    cursor = history.GetCursor()
+
+    # added events extend the cached list, the retained ones are not rebuilt
+    first = events[0]
+    history.AddEvent(GameEvent(100, 'PASS', 'p1', 'p2'))
+    assert history.event_list is events and len(events) == 21
+    assert events[0] is first and events[-1] == GameEvent(100, 'PASS', 'p1', 'p2')
+    # events going away start a new list, the old one is left as it was
+    history.Truncate(cursor)
+    assert history.event_list is not events and len(history.event_list) == 20
+    assert len(events) == 21
+    history.Clear()
+    assert history.event_list == []
+
+
+def test_truncate_across_clears():
+    history = make_history(count=30)
+    cursor = history.GetCursor()
+    events = list(history.event_list)
+    later = None
+    for _ in range(3):
+        for i in range(10):
+            history.AddEvent(GameEvent(1000 + i, 'PASS', 'p1', 'p2'))
+        later = later or history.GetCursor()
+        history.Clear()
+    # sequence numbers keep counting up over clears
+    assert history.GetCursor().sequence == 60
+
+    history.Truncate(cursor)
+    assert history.event_list == events and len(history.FindEvents('PASS', min_tick=1000)) == 0
+    # the events of later cursors are gone
+    with pytest.raises(ValueError):
+        history.Truncate(later)
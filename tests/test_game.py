@@ -0,0 +1,245 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import copy
+
+import numpy
+import pytest
+
+from sts2.client_adapter import ClientAdapter, format_state
+from sts2.environment import get_game
+from sts2.game import npc_brain
+from sts2.game.game import Game
+from sts2.game.game_state import Action
+from sts2.game.player import SimplePlayer
+from sts2.game.rules import PACMAN_GAME_RULES, Rules
+from sts2.game.settings import TeamSide
+from sts2.game.simulation import HistoryPolicy
+
+
+def run_game(ticks, evaluate):
+    game = get_game(3, 3, 0, 0, timeout_ticks=1000, seed=3)
+    for _ in range(ticks):
+        game.update()
+        if evaluate:
+            format_state(game)
+            for player in game.players:
+                game.PlayerShot(player, True, 0)
+    return game
+
+
+def test_games_do_not_share_their_timeout():
+    first = get_game(1, 1, 0, 0, timeout_ticks=100)
+    second = get_game(1, 1, 0, 0, timeout_ticks=200)
+    assert first.rules.max_tick == 100 and second.rules.max_tick == 200
+
+
+def test_simulated_shots_do_not_change_trajectories():
+    plain = run_game(200, False)
+    evaluated = run_game(200, True)
+    assert numpy.array_equal(plain.state.values, evaluated.state.values)
+
+
+def test_shot_pass_evaluation_is_memoized():
+    game = run_game(30, False)
+    controller = game.control.GetControl()
+    teammates = [p for p in game.team_players[controller.team_side] if p is not controller]
+    shots, passes = game.GetShotPassEvaluation()
+    assert game.GetShotPassEvaluation()[0] is shots
+    assert numpy.allclose(game.EvaluatePasses(controller, teammates),
+                          [game.PlayerPass(controller, p, True, 0) for p in teammates])
+
+    controller.SetPosition(game, controller.GetPosition(game) + 1.0)
+    assert game.GetShotPassEvaluation()[0] is not shots
+
+
+def test_derived_state_follows_position_and_control_changes():
+    game = run_game(30, False)
+    derived = game.derived
+    distances = derived.GetDistanceMatrix()
+    assert derived.GetDistanceMatrix() is distances
+
+    player = game.players[0]
+    player.SetPosition(game, player.GetPosition(game) + numpy.array([3.0, 0.0]))
+    expected = [numpy.linalg.norm(player.GetPosition(game) - other.GetPosition(game))
+                for other in game.players]
+    assert numpy.allclose(derived.GetDistanceMatrix()[0], expected)
+
+    other = game.team_players[1 - game.control.GetControl().team_side][0]
+    game.control.GiveControl(other)
+    assert game.control.GetControl() is other
+    ranks = derived.GetDistanceRanks()[other.team_side]
+    assert ranks[other.name] == 0
+
+
+def test_save_and_restore_state():
+    game = run_game(50, False)
+    controller = game.control.GetControl()
+    token = game.save_state()
+    events = len(game.game_event_history)
+    branches = []
+    for _ in range(2):
+        game.restore_state(token)
+        for _ in range(300):
+            game.update()
+        branches.append((game.state.values.copy(), game.game_event_history.event_list))
+    assert numpy.array_equal(branches[0][0], branches[1][0])
+    assert branches[0][1] == branches[1][1]
+
+    game.restore_state(token)
+    assert game.tick == 50 and len(game.game_event_history) == events
+    assert game.game_event_history.FindEvents(min_tick=50) == []
+    assert game.control.GetControl() is controller
+    assert game.save_state(token) is token
+
+
+@pytest.mark.parametrize('mode', [HistoryPolicy.EPISODE, HistoryPolicy.RING])
+def test_restore_state_restores_dropped_events(mode):
+    policy = HistoryPolicy(mode, max_ticks=30)
+    game = get_game(3, 3, 0, 0, timeout_ticks=1000, history_policy=policy, seed=3)
+    for _ in range(20):
+        game.update()
+    token = game.save_state()
+    history = game.game_event_history
+    events = list(history.event_list)
+    passes = history.FindEvents('PASS')
+    for _ in range(400):
+        game.update()
+    # goals started new episodes and the window moved on, the events of the save are gone
+    assert game.GetScore(TeamSide.HOME) + game.GetScore(TeamSide.AWAY) > 0
+    assert history.event_list[0].tick > 20
+
+    game.restore_state(token)
+    assert game.tick == 20
+    assert history.event_list == events and history.FindEvents('PASS') == passes
+    for _ in range(400):
+        game.update()
+    assert history.event_list[0].tick > 20
+
+
+def test_games_own_their_random_streams():
+    alone = run_game(300, False)
+    first = get_game(3, 3, 0, 0, timeout_ticks=1000, seed=3)
+    second = get_game(3, 3, 0, 0, timeout_ticks=1000, seed=4)
+    for _ in range(300):
+        first.update()
+        second.update()
+    assert numpy.array_equal(alone.state.values, first.state.values)
+    assert not numpy.array_equal(first.state.values, second.state.values)
+
+    fork = first.fork()
+    first.update()
+    fork.update()
+    assert numpy.array_equal(first.state.values, fork.state.values)
+
+
+def crossover_constraint(game, player):
+    # the per-player CROSSOVER_CONSTRAINT Game.LocomotionUpdate used to apply
+    i = player.GetTeamIndex(game)
+    x1 = 0.2
+    x2 = 0.6
+    y1 = 0.0
+    y2 = 1.0
+    if i % 2:
+        x1, x2 = 1.0 - x1, 1.0 - x2
+
+    x, y = game.arena.GetNormalizedCoord(player.GetPosition(game))
+    if player.team_side == TeamSide.AWAY:
+        x, y = 1.0 - x, 1.0 - y
+    x_prime = x1 + (x2 - x1) * y / (y2 - y1)
+    if player.team_side == TeamSide.AWAY:
+        x_prime, y = 1.0 - x_prime, 1.0 - y
+    player.SetPosition(game, game.arena.GetArenaCoordFromNormalized(numpy.array([x_prime, y])))
+
+
+def test_locomotion_matches_per_player_motion_model():
+    pacman = copy.copy(PACMAN_GAME_RULES)
+    pacman.layout_constraint = Rules.LayoutConstraint.NONE
+    for rules in [None, pacman, PACMAN_GAME_RULES]:
+        game = get_game(3, 3, 0, 0, timeout_ticks=1000, seed=5, rules=rules)
+        for _ in range(40):
+            game.update()
+        game.state.velocities[...] = game.rng.uniform(-1, 1, game.state.velocities.shape)
+        game.state.action_times[0] = 3
+        reference = game.fork()
+        for player in reference.players:
+            player.RunMotionModel(reference, player.GetInput(reference),
+                                  player.GetActionTime(reference))
+            if rules is PACMAN_GAME_RULES:
+                crossover_constraint(reference, player)
+        game.LocomotionUpdate(0)
+        assert numpy.allclose(game.state.positions, reference.state.positions)
+        assert numpy.allclose(game.state.velocities, reference.state.velocities)
+
+
+def test_npc_brain_matches_per_player_think(monkeypatch):
+    for random_play in [False, True]:
+        if random_play:
+            monkeypatch.setattr(SimplePlayer, 'RANDOM_SHOT_CHANCE', 0.03)
+            monkeypatch.setattr(SimplePlayer, 'RANDOM_PASS_CHANCE', 0.03)
+            monkeypatch.setattr(SimplePlayer, 'RANDOM_SKATE_CHANCE', 0.9)
+        games = [get_game(4, 4, 1, 0, timeout_ticks=1000, seed=7) for _ in range(2)]
+        # the brain only takes over larger rosters by default
+        assert games[0].npc_brain is None
+        assert get_game(8, 8, 0, 0, timeout_ticks=1000).npc_brain is not None
+        games[0].npc_brain = npc_brain.NPCBrain(games[0])
+        for game in games:
+            agents = game.client_adapter.GetAgents()
+            game.client_adapter.receive_action_arrays(numpy.zeros(len(agents), dtype=int),
+                                                      numpy.ones((len(agents), 2)))
+            for _ in range(600):
+                game.update()
+        assert numpy.array_equal(games[0].state.values, games[1].state.values)
+        assert games[0].game_event_history.event_list == games[1].game_event_history.event_list
+        assert len(games[0].game_event_history.FindEvents('PASS')) > 0
+
+
+class FollowingPlayer(SimplePlayer):
+    """ Draws from game.rng and copies the input of the NPC before it in the roster. """
+
+    def custom_think(self, game, verbosity):
+        super().custom_think(game, verbosity)
+        leader = game.players[game.players.index(self) - 1]
+        if leader.GetAction(game) != Action.STUNNED and game.rng.random() < 0.5:
+            self.SetInput(game, leader.GetInput(game))
+
+
+def test_npc_brain_keeps_roster_order_around_other_players():
+    games = []
+    for _ in range(2):
+        players = [SimplePlayer('h_npc_1', TeamSide.HOME),
+                   FollowingPlayer('h_ai_1', TeamSide.HOME)]
+        players += [SimplePlayer('h_npc_' + str(i), TeamSide.HOME) for i in range(2, 4)]
+        players += [SimplePlayer('a_npc_1', TeamSide.AWAY),
+                    FollowingPlayer('a_ai_1', TeamSide.AWAY)]
+        players += [SimplePlayer('a_npc_' + str(i), TeamSide.AWAY) for i in range(2, 4)]
+        games.append(Game(players, client_adapter_cls=ClientAdapter, seed=5))
+    games[0].npc_brain = npc_brain.NPCBrain(games[0])
+    games[1].npc_brain = None
+    for game in games:
+        for _ in range(600):
+            game.update()
+    assert numpy.array_equal(games[0].state.values, games[1].state.values)
+    assert games[0].game_event_history.event_list == games[1].game_event_history.event_list
+
+
+class CarefulPlayer(SimplePlayer):
+    SHOT_CHANCE = 0.6
+    SHOOT_ARENA_DIST = 0.2
+
+
+def test_npc_brain_reads_tuned_players():
+    games = []
+    for _ in range(2):
+        players = [CarefulPlayer('h_npc_1', TeamSide.HOME)]
+        players += [SimplePlayer('h_npc_' + str(i), TeamSide.HOME) for i in range(2, 5)]
+        players += [SimplePlayer('a_npc_' + str(i), TeamSide.AWAY) for i in range(1, 5)]
+        players[1].PASS_CHANCE = 0.2
+        players[5].RANDOM_SKATE_CHANCE = 0.5
+        players[6].RANDOM_PASS_CHANCE = 0.5
+        games.append(Game(players, client_adapter_cls=ClientAdapter, seed=11))
+    games[0].npc_brain = npc_brain.NPCBrain(games[0])
+    for game in games:
+        for _ in range(600):
+            game.update()
+    assert numpy.array_equal(games[0].state.values, games[1].state.values)
+    assert games[0].game_event_history.event_list == games[1].game_event_history.event_list
@@ -0,0 +1,36 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import numpy
+
+from sts2.environment import get_game
+from sts2.game.game_state import Action, GameState
+from sts2.game.settings import GamePhase
+
+
+def test_snapshot_round_trip():
+    game = get_game(3, 3, 0, 0, timeout_ticks=100)
+    for _ in range(20):
+        game.update()
+
+    snapshot = game.state.GetSnapshot()
+    assert snapshot[GameState.CURRENT_PHASE] == GamePhase.GAME_ON
+    assert snapshot['home0' + GameState.PLAYER_ACTION] in Action.ACTION_LIST
+    assert isinstance(snapshot[GameState.CONTROL_TEAM], int)
+
+    other = get_game(3, 3, 0, 0, timeout_ticks=100)
+    other.state.SetFromSnapshot(snapshot)
+    assert numpy.array_equal(other.state.values, game.state.values)
+
+
+def test_frames_are_detached():
+    game = get_game(2, 2, 0, 0, timeout_ticks=100)
+    game.update()
+    frame = game.game_state_history[-1].state
+    position = frame['home0' + GameState.PLAYER_POS_X]
+
+    player = game.team_players[0][0]
+    player.SetPosition(game, player.GetPosition(game) + 1.0)
+
+    assert frame['home0' + GameState.PLAYER_POS_X] == position
+    assert frame.current_phase == GamePhase.GAME_ON
+    assert frame.ToSeries()['home0' + GameState.PLAYER_NAME] == player.name
@@ -0,0 +1,30 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import subprocess
+import sys
+
+HEADLESS_IMPORT = 'import sts2.environment, sts2.vector_env, sts2.rollout'
+# seconds, workers import these on spin up, about 0.15s here and 0.65s with pygame and pandas
+IMPORT_BUDGET = 0.5
+
+
+def loaded_modules(statement):
+    # a fresh interpreter, the test session has imported everything already
+    output = subprocess.check_output(
+        [sys.executable, '-W', 'ignore', '-c',
+         statement + '; import sys; print(" ".join(sorted(sys.modules)))'])
+    return set(output.decode().split())
+
+
+def test_headless_import_skips_pygame_and_pandas():
+    modules = loaded_modules(HEADLESS_IMPORT)
+    assert 'pygame' not in modules
+    assert 'pandas' not in modules
+
+
+def test_headless_import_time():
+    # best of a few fresh interpreters, the interpreter start up itself is not counted
+    statement = 'import time; start = time.perf_counter(); %s; print(time.perf_counter() - start)'
+    seconds = min(float(subprocess.check_output(
+        [sys.executable, '-W', 'ignore', '-c', statement % HEADLESS_IMPORT])) for _ in range(3))
+    assert seconds < IMPORT_BUDGET
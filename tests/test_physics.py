@@ -0,0 +1,39 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import numpy
+
+from sts2.game import kernels
+
+
+def brute_force_pairs(radius, position):
+    pairs = []
+    for i in range(len(position)):
+        for j in range(i + 1, len(position)):
+            if kernels.Norm(position[i] - position[j]) <= radius * 2:
+                pairs.append((i, j))
+    return pairs
+
+
+def test_sweep_pairs_match_brute_force():
+    rng = numpy.random.default_rng(0)
+    radius = 0.75
+    for num_players in [0, 1, 2, 6, 20, 60]:
+        for _ in range(20):
+            uniform = rng.uniform(-6.0, 6.0, (num_players, 2))
+            # on a grid of radius steps many pairs share an x or touch exactly
+            grid = rng.integers(-8, 8, (num_players, 2)) * radius
+            for position in [uniform, grid]:
+                first, second = kernels.SweepPairsKernel(radius, position)
+                assert list(zip(first.tolist(), second.tolist())) == brute_force_pairs(
+                    radius, position)
+
+
+def test_sweep_pairs_include_touching_pairs():
+    radius = 0.75
+    # pairs exactly 2 * radius apart along x or z, and a far player sharing an x
+    position = numpy.array([[0.0, 0.0], [1.5, 0.0], [5.0, 3.0], [5.0, 4.5], [9.0, 0.0],
+                            [10.5, 0.0], [10.5, 9.0], [-4.0, -4.0], [-4.0, -2.5]])
+    first, second = kernels.SweepPairsKernel(radius, position)
+    pairs = list(zip(first.tolist(), second.tolist()))
+    assert pairs == brute_force_pairs(radius, position)
+    assert pairs == [(0, 1), (2, 3), (4, 5), (7, 8)]
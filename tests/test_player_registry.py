@@ -0,0 +1,69 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import numpy
+
+from sts2.environment import get_game
+from sts2.game.game_state import GameState
+from sts2.game.player import Player
+from sts2.game.player_registry import PlayerRegistry
+from sts2.game.settings import TeamSide
+
+
+def make_registry():
+    home = [Player('h_' + str(i), TeamSide.HOME) for i in range(3)]
+    away = [Player('a_' + str(i), TeamSide.AWAY) for i in range(2)]
+    # game.players does not have to list the teams in order
+    players = [away[1], home[0], away[0], home[2], home[1]]
+    return PlayerRegistry(players, [home, away]), players, home, away
+
+
+def test_global_and_team_indices():
+    registry, players, home, away = make_registry()
+    for global_index, player in enumerate(players):
+        assert registry.GetGlobalIndex(player) == global_index
+        assert registry.GetEntry(player).global_index == global_index
+        assert registry.entry_list[global_index].player is player
+    for team_side, team in zip(TeamSide.TEAMSIDES, [home, away]):
+        for team_index, player in enumerate(team):
+            assert registry.GetTeamIndex(player) == team_index
+            assert registry.GetPlayer(team_side, team_index) is player
+        assert registry.team_indices[team_side].tolist() == [players.index(p) for p in team]
+
+
+def test_field_names():
+    registry, players, home, away = make_registry()
+    assert registry.GetPrefix(home[2]) == 'home2'
+    assert registry.GetPrefix(away[1]) == 'away1'
+    assert registry.GetFieldName(away[0], GameState.PLAYER_POS_X) == 'away0' + \
+           GameState.PLAYER_POS_X
+    # repeated lookups hand back the cached name
+    assert registry.GetFieldName(home[1], GameState.PLAYER_NAME) is registry.GetFieldName(
+        home[1], GameState.PLAYER_NAME)
+
+
+def test_players_are_looked_up_by_identity():
+    # players equal in name and side still get their own entries
+    home = [Player('twin', TeamSide.HOME), Player('twin', TeamSide.HOME)]
+    away = [Player('twin', TeamSide.AWAY)]
+    registry = PlayerRegistry(home + away, [home, away])
+    assert [registry.GetGlobalIndex(player) for player in home + away] == [0, 1, 2]
+    assert [registry.GetTeamIndex(player) for player in home + away] == [0, 1, 0]
+    assert registry.GetPrefix(home[1]) == 'home1'
+
+
+def test_slots_are_stable():
+    game = get_game(3, 2, 0, 0, timeout_ticks=100, seed=0)
+    registry = game.registry
+    slots = {player: registry.GetGlobalIndex(player) for player in game.players}
+    fork = None
+    for tick in range(60):
+        game.update()
+        if tick == 30:
+            fork = game.fork()
+    assert fork.registry is registry
+    for player in game.players:
+        assert registry.GetGlobalIndex(player) == slots[player]
+        # the state views are ordered by the registry's global indices
+        position = game.state.GetPlayerPosition(player)
+        assert numpy.array_equal(game.state.positions[slots[player]], position)
+        assert game.state.GetPlayerFieldPrefix(player) == registry.GetPrefix(player)
@@ -0,0 +1,37 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import json
+
+from sts2.environment import get_game
+from sts2.game.profiler import TickProfiler
+
+
+def test_tick_profiler(tmp_path):
+    game = get_game(3, 3, 0, 0, timeout_ticks=1000, seed=0)
+    profiler = TickProfiler()
+    game.SetProfiler(profiler)
+    for _ in range(100):
+        game.update()
+    game.client_adapter.send_state()
+
+    stats = profiler.GetStats()
+    assert stats['stages']['Game.CustomTick']['calls'] == 100
+    # PhaseUpdate calls itself on phase changes, only the outer call is timed
+    assert stats['stages']['Game.PhaseUpdate']['calls'] == 100
+    assert stats['stages']['Physics.Update']['calls'] == 100
+    assert stats['stages']['format_state']['calls'] == 1
+    assert sum(n for _, n in stats['stages']['Game.AIUpdate']['histogram']) == 100
+    assert 'collision_pairs' in stats['counters']
+    profiler.Dump(str(tmp_path / 'profile.json'))
+    with open(str(tmp_path / 'profile.json')) as f:
+        assert json.load(f)['stages'].keys() == stats['stages'].keys()
+
+    fork = game.fork()
+    fork.update()
+    assert fork.profiler is None
+    assert profiler.GetStats()['stages']['Game.CustomTick']['calls'] == 100
+
+    game.SetProfiler(None)
+    game.update()
+    assert profiler.stages['Game.CustomTick'].calls == 100
+    assert 'CustomTick' not in vars(game) and 'Update' not in vars(game.physics)
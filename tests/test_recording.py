@@ -0,0 +1,92 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import numpy
+import pytest
+
+from sts2.environment import get_game
+from sts2.game.game_state import Action, GameState
+from sts2.game.settings import GamePhase
+from sts2.game.recording import EpisodeRecording
+from sts2.game.simulation import GameEvent, GameEventHistory, HistoryPolicy
+
+
+@pytest.mark.parametrize('file_name', ['episode.npz', 'episode'])
+def test_recording_round_trip(tmp_path, file_name):
+    game = get_game(2, 2, 0, 0, timeout_ticks=3000, seed=0)
+    for _ in range(1500):  # past the initial capacity
+        game.update()
+
+    history = game.game_state_history
+    assert len(history) == 1500
+    entry = history[-1]
+    assert entry.tick == 1499
+    assert Action.ACTION_LIST[entry.player_action_list[0]] == entry.state[
+        'home0' + GameState.PLAYER_ACTION]
+    assert entry.player_policy_list[0].shape == (12,)
+
+    path = str(tmp_path / file_name)
+    history.Save(path)
+    loaded = EpisodeRecording.Load(path, game.state.layout)
+    assert len(loaded) == 1500
+    assert numpy.array_equal(loaded.GetColumn('state'), history.GetColumn('state'))
+    assert loaded.GetFrame(700).GetSnapshot() == history.GetFrame(700).GetSnapshot()
+    assert loaded[10].player_reward_list == history[10].player_reward_list
+
+
+def test_ring_history_keeps_last_ticks():
+    game = get_game(2, 2, 0, 0, timeout_ticks=3000, seed=0, history_policy=HistoryPolicy(
+        HistoryPolicy.RING, max_ticks=100))
+    for _ in range(250):
+        game.update()
+
+    history = game.game_state_history
+    assert len(history) == 100
+    assert list(history.GetColumn('tick')) == list(range(150, 250))
+    assert history[0].tick == 150 and history.GetFrame(-1).values is not None
+    assert min(e.tick for e in game.game_event_history.event_list) > 149
+
+    # the event window follows the ticks, not the events
+    events = GameEventHistory(HistoryPolicy(HistoryPolicy.RING, max_ticks=100))
+    events.AddEvent(GameEvent(10, 'GOAL', 'a', ''))
+    events.Advance(109)
+    assert len(events) == 1
+    events.Advance(110)
+    assert len(events) == 0
+
+
+def test_spill_and_episode_history(tmp_path):
+    game = get_game(2, 2, 0, 0, timeout_ticks=3000, seed=0, history_policy=HistoryPolicy(
+        HistoryPolicy.SPILL, max_ticks=100, spill_dir=str(tmp_path)))
+    for _ in range(250):
+        game.update()
+    assert len(game.game_state_history) == 50
+    spilled = EpisodeRecording.Load(str(tmp_path / 'ticks_000000100.npz'), game.state.layout)
+    assert list(spilled.GetColumn('tick')) == list(range(100, 200))
+    assert (tmp_path / 'events_000000000.json').exists()
+
+    game = get_game(2, 2, 0, 0, timeout_ticks=50, seed=0, history_policy=HistoryPolicy(
+        HistoryPolicy.EPISODE))
+    for _ in range(80):
+        game.update()
+    # recording stops after the first GAME_OVER tick
+    phases = [game.game_state_history.GetFrame(i).current_phase for i in
+              range(len(game.game_state_history))]
+    assert phases.count(GamePhase.GAME_OVER) == 1
+
+
+def test_episode_history_starts_with_each_play():
+    games = [get_game(2, 2, 0, 0, timeout_ticks=400, seed=0, history_policy=HistoryPolicy(mode))
+             for mode in [HistoryPolicy.ALL, HistoryPolicy.EPISODE]]
+    for game in games:
+        for _ in range(450):
+            game.update()
+    everything, episode = games
+    assert episode.history_policy.max_ticks == HistoryPolicy.EPISODE_MAX_TICKS
+
+    # the last play starts on the tick after the last goal and ends with GAME_OVER at tick 400
+    last_goal = everything.game_event_history.FindEvents('GOAL')[-1].tick
+    ticks = list(episode.game_state_history.GetColumn('tick'))
+    assert ticks == list(range(last_goal + 1, 401))
+    assert episode.game_event_history.event_list == everything.game_event_history.FindEvents(
+        min_tick=last_goal + 1, max_tick=400)
+    assert len(everything.game_event_history.FindEvents(min_tick=401)) > 0
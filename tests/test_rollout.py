@@ -0,0 +1,74 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from sts2.environment import get_game
+from sts2.game.game_state import Action
+from sts2.rollout import RolloutCollector, fork_rollouts
+from sts2.vector_env import ACTION_SIZE
+
+
+def shoot_policy(observation):
+    actions = np.zeros((len(observation), 2, ACTION_SIZE), dtype=np.float32)
+    actions[..., 0] = Action.ACTION_LIST.index(Action.SHOOT)
+    return actions
+
+
+def failing_policy(observation):
+    raise ValueError('policy failed')
+
+
+def test_rollout_collector_fills_slots_with_back_pressure():
+    with RolloutCollector(2, games_per_worker=2, chunk_length=16, num_slots=3, seed=0,
+                          policy=shoot_policy, num_home_players=2, num_away_players=2,
+                          num_home_agents=1, num_away_agents=1, timeout_ticks=20) as collector:
+        chunks = [collector.get(timeout=30) for _ in range(3)]
+        # every slot is taken, workers wait until one is released
+        with pytest.raises(queue.Empty):
+            collector.get(timeout=0.5)
+
+        for chunk in chunks:
+            assert chunk.observation.shape == (16, 2, len(collector.observation_fields))
+            assert chunk.action.shape == (16, 2, 4)
+            assert chunk.input.shape == (16, 2, 4, 2)
+            assert chunk.reward.shape == (16, 2, 4)
+            assert chunk.done.shape == (16, 2)
+        assert sorted(chunk.slot for chunk in chunks) == [0, 1, 2]
+
+        collector.release(chunks[0])
+        chunk = collector.get(timeout=30)
+        assert chunk.slot == chunks[0].slot
+        assert chunk.done.any() or any(c.done.any() for c in chunks)
+
+
+def test_rollout_collector_raises_worker_errors():
+    with RolloutCollector(1, chunk_length=4, seed=0, policy=failing_policy, num_home_players=1,
+                          num_away_players=1, num_home_agents=1) as collector:
+        with pytest.raises(RuntimeError, match='policy failed'):
+            collector.get()
+
+
+def test_fork_rollouts():
+    game = get_game(2, 2, 0, 0, timeout_ticks=1000)
+    for _ in range(20):
+        game.update()
+    values = game.state.values.copy()
+    events = len(game.game_event_history)
+
+    fork = game.fork()
+    assert fork.players is game.players and fork.rules is game.rules
+    for _ in range(50):
+        fork.update()
+    assert fork.tick == game.tick + 50
+    assert np.array_equal(game.state.values, values)
+    assert len(game.game_event_history) == events
+    assert game.control.GetControl() is game.derived.ComputeController()
+
+    with ProcessPoolExecutor(2) as executor:
+        scores = fork_rollouts(game, [None, None, None], 100, executor=executor)
+    assert len(scores) == 3
+    assert np.array_equal(game.state.values, values)
@@ -0,0 +1,32 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import json
+
+from sts2.environment import STS2Environment
+from sts2.game.tracer import ChromeTracer
+
+
+def test_chrome_trace(tmp_path):
+    path = str(tmp_path / 'trace.json')
+    env = STS2Environment(timeout_ticks=1000)
+    env.seed(0)
+    with ChromeTracer(path, batch_size=100) as tracer:
+        env.SetProfiler(tracer)
+        env.reset()
+        for _ in range(200):
+            env.step(None)
+        env.SetProfiler(None)
+        env.step(None)
+
+    with open(path) as f:
+        events = json.load(f)
+    steps = [e for e in events if e.get('name') == 'STS2Environment.step']
+    ticks = [e for e in events if e.get('cat') == 'tick']
+    assert len(steps) == 200 and len(ticks) == 200
+    assert [e['args']['tick'] for e in ticks] == list(range(200))
+    # every tick lies within its step
+    for step, tick in zip(steps, ticks):
+        assert step['ts'] <= tick['ts'] and tick['ts'] + tick['dur'] <= step['ts'] + step['dur']
+    game_events = [e for e in events if e.get('cat') == 'event']
+    assert len(game_events) == len(env.game.game_event_history)
+    assert game_events[0]['name'] == 'GAME_START'
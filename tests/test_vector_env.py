@@ -0,0 +1,80 @@
+# Copyright (C) 2020 Electronic Arts Inc.  All rights reserved.
+
+import numpy as np
+import pytest
+
+from sts2.game.game_state import Action
+from sts2.vector_env import STS2VectorEnv, ACTION_SIZE
+
+
+@pytest.mark.parametrize('backend', ['sync', 'subprocess'])
+def test_vector_env_steps_and_restarts(backend):
+    env = STS2VectorEnv(3, backend=backend, num_workers=2, num_home_players=2,
+                        num_away_players=2, num_home_agents=1, num_away_agents=1,
+                        timeout_ticks=10)
+    try:
+        env.seed(0)
+        obs, info = env.reset()
+        assert obs.shape == (3, len(env.observation_fields))
+        assert env.agent_names == ['h_ai_1', 'a_ai_1']
+
+        actions = np.zeros((3, env.num_agents, ACTION_SIZE), dtype=np.float32)
+        actions[..., 0] = Action.ACTION_LIST.index(Action.NONE)
+        actions[..., 1] = 1.0
+        phase = env.observation_fields.index('current_phase')
+        for _ in range(10):
+            obs, reward, done, info = env.step(actions)
+            assert reward.shape == (3, 2)
+            assert not done.any()
+        obs, reward, done, info = env.step(actions)
+        assert done.all()
+        assert (info['terminal_observation'][:, phase] != obs[:, phase]).all()
+    finally:
+        env.close()
+
+
+def test_vector_env_reset_restarts_games():
+    observations = []
+    for backend in ['sync', 'subprocess']:
+        env = STS2VectorEnv(2, backend=backend, num_workers=2, num_home_agents=1,
+                            num_away_agents=1)
+        try:
+            env.seed(0)
+            first, _ = env.reset()
+            first = first.copy()
+            for _ in range(5):
+                env.step()
+            obs, _ = env.reset()
+            assert np.array_equal(obs, first)
+            obs, _, _, _ = env.step()
+            observations.append(obs.copy())
+        finally:
+            env.close()
+    assert np.array_equal(observations[0], observations[1])
+
+
+def test_vector_env_raises_worker_errors():
+    env = STS2VectorEnv(2, backend='subprocess', num_workers=2, num_home_agents=1,
+                        num_away_agents=1)
+    try:
+        actions = np.zeros((2, env.num_agents, ACTION_SIZE), dtype=np.float32)
+        actions[..., 0] = Action.NUM
+        with pytest.raises(RuntimeError, match='action index out of range'):
+            env.step(actions)
+    finally:
+        env.close()
+
+
+def test_vector_env_seeds_do_not_share_streams():
+    draws = {}
+    for seed in [0, 1]:
+        env = STS2VectorEnv(2, backend='sync', num_home_agents=1, num_away_agents=1)
+        try:
+            env.seed(seed)
+            for i, sub_env in enumerate(env.backend.envs):
+                draws[seed, i] = sub_env.game.rng.random(4)
+        finally:
+            env.close()
+    # with seed + i, sub-env 1 of seed 0 and sub-env 0 of seed 1 would draw the same numbers
+    assert not np.array_equal(draws[0, 1], draws[1, 0])
+    assert not np.array_equal(draws[0, 0], draws[0, 1])